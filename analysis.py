@@ -0,0 +1,83 @@
+import argparse
+import glob
+import multiprocessing
+import sys
+import numpy
+import simulation
+from store import load_keys
+
+STAR_SCORE = 100
+TIME_SCORE = 10
+
+def scores(result):
+    values = result.stars * STAR_SCORE
+    remaining = numpy.maximum(simulation.MAX_TIME - result.times, 0)
+    values = values + result.complete * remaining * TIME_SCORE
+    return values
+
+def sensitivity(result, count):
+    stars = result.stars.reshape(-1, count)
+    changes = stars != numpy.roll(stars, 1, axis=1)
+    return float(changes.mean())
+
+def analyze_level(key, count=simulation.DEFAULT_ANGLES, powers=simulation.DEFAULT_POWERS):
+    results = simulation.sweep(key, count, powers)
+    metrics = {
+        'name': key.get('name', ''),
+        'rockets': len(results),
+        'solvable': 0.0,
+        'best': 0,
+        'sensitivity': 0.0,
+    }
+    if results:
+        metrics['solvable'] = float(numpy.mean([result.complete.mean() for result in results]))
+        metrics['best'] = int(max(scores(result).max() for result in results))
+        metrics['sensitivity'] = float(numpy.mean([sensitivity(result, count) for result in results]))
+    return metrics
+
+def analyze_project(keys, processes=None, callback=None):
+    pool = multiprocessing.Pool(processes)
+    try:
+        result = []
+        for index, metrics in enumerate(pool.imap(analyze_level, keys)):
+            if callback and callback(index, metrics) is False:
+                pool.terminate()
+                break
+            result.append(metrics)
+        return result
+    finally:
+        pool.close()
+        pool.join()
+
+def failed(metrics, min_solvable=0.0):
+    return metrics['rockets'] == 0 or metrics['solvable'] < min_solvable
+
+# Command Line
+def main(args=None):
+    parser = argparse.ArgumentParser(description='Analyze Star Rocket levels.')
+    parser.add_argument('paths', nargs='+', help='.star files (wildcards allowed)')
+    parser.add_argument('-p', '--processes', type=int, default=None)
+    parser.add_argument('-m', '--min-solvable', type=float, default=0.0,
+        help='fail when a level completes on fewer than this fraction of launches; 0 disables the check')
+    args = parser.parse_args(args)
+    paths = []
+    for pattern in args.paths:
+        paths.extend(sorted(glob.glob(pattern)) or [pattern])
+    jobs = []
+    for path in paths:
+        for index, key in enumerate(load_keys(path)):
+            jobs.append((path, index, key))
+    def report(job, metrics):
+        path, index, key = jobs[job]
+        flag = '\tFAIL' if failed(metrics, args.min_solvable) else ''
+        print('%s\t%d\t%s\t%.3f\t%d\t%.3f%s' % (path, index + 1, metrics['name'],
+            metrics['solvable'], metrics['best'], metrics['sensitivity'], flag))
+        sys.stdout.flush()
+    print('file\tlevel\tname\tsolvable\tbest\tsensitivity')
+    results = analyze_project([key for path, index, key in jobs], args.processes, report)
+    failures = [metrics for metrics in results if failed(metrics, args.min_solvable)]
+    return 1 if failures else 0
+
+if __name__ == '__main__':
+    multiprocessing.freeze_support()
+    sys.exit(main())
@@ -0,0 +1,215 @@
+import math
+import random
+import sys
+import time
+import transform
+from constants import DEFAULT_BOUNDS
+from store import load_keys
+
+try:
+    import duplicates
+except ImportError:
+    duplicates = None
+
+try:
+    import render
+except ImportError:
+    render = None
+
+def timed(label, func, *args):
+    start = time.time()
+    result = func(*args)
+    print('%-32s %8.3fs' % (label, time.time() - start))
+    return result
+
+def random_entities(count, seed=0):
+    import main
+    rand = random.Random(seed)
+    entities = []
+    for index in range(count):
+        x = rand.randint(-400, 400)
+        y = rand.randint(-400, 400)
+        entity = main.Star(x, y)
+        if index % 4 == 0:
+            entity.path = main.CircularPath(0, 0, 4.0, True)
+        entities.append(entity)
+    return entities
+
+# Transform Benchmarks
+def legacy_rotate(entities, degrees):
+    def rotate(x, y):
+        if x == 0 and y == 0:
+            return x, y
+        d = (x * x + y * y) ** 0.5
+        angle = math.atan2(y, x) + math.radians(degrees)
+        return math.cos(angle) * d, math.sin(angle) * d
+    for entity in entities:
+        entity.x, entity.y = rotate(entity.x, entity.y)
+        if entity.path:
+            entity.path.x, entity.path.y = rotate(entity.path.x, entity.path.y)
+
+def legacy_offset(entities, dr):
+    def offset(x, y):
+        if x == 0 and y == 0:
+            return x, y
+        radius = (x * x + y * y) ** 0.5 + dr
+        angle = math.atan2(y, x)
+        return math.cos(angle) * radius, math.sin(angle) * radius
+    for entity in entities:
+        entity.x, entity.y = offset(entity.x, entity.y)
+        if entity.path:
+            entity.path.x, entity.path.y = offset(entity.path.x, entity.path.y)
+
+def bench_transform(count=50000):
+    print('transform: %d entities, numpy=%s' % (count, transform.numpy is not None))
+    entities = random_entities(count)
+    timed('legacy rotate', legacy_rotate, entities, 30)
+    timed('legacy offset', legacy_offset, entities, 10)
+    timed('rotate', transform.transform, entities, transform.rotation(30))
+    timed('rotate about pivot', transform.transform, entities, transform.rotation(30, 100, 50))
+    timed('scale about pivot', transform.transform, entities, transform.scaling(2, 2, 100, 50))
+    timed('flip about axis', transform.transform, entities, transform.reflection(45, 100, 50))
+    timed('mirror', transform.transform, entities, transform.scaling(-1, 1))
+    timed('translate', transform.transform, entities, transform.translation(10, 0))
+    timed('offset', transform.offset, entities, 10)
+
+# Duplicate Benchmarks
+def variant(key, rand):
+    # rotated, mirrored, shifted and slightly jittered copy of a level
+    angle = math.radians(rand.uniform(0, 360))
+    mirror = rand.choice([-1, 1])
+    dx, dy = rand.uniform(-500, 500), rand.uniform(-500, 500)
+    jitter = rand.choice([0, 0, 5, 40])
+    c, s = math.cos(angle), math.sin(angle)
+    entities = {}
+    for group, keys in key.get('entities', {}).items():
+        entities[group] = []
+        for entity in keys:
+            x, y = entity.get('x', 0) * mirror, entity.get('y', 0)
+            entity = dict(entity)
+            entity['x'] = c * x - s * y + dx + rand.uniform(-jitter, jitter)
+            entity['y'] = s * x + c * y + dy
+            entities[group].append(entity)
+    return dict(key, entities=entities)
+
+def bench_duplicates(count=20000, path='files/original.star'):
+    if duplicates is None:
+        print('duplicates: requires numpy')
+        return
+    rand = random.Random(0)
+    keys = load_keys(path)
+    variants = [variant(rand.choice(keys), rand) for index in range(count)]
+    print('duplicates: %d variants of %d levels' % (count, len(keys)))
+    timed('signatures', duplicates.signatures, variants)
+    exact, near = timed('find duplicates', duplicates.find_duplicates, variants)
+    print('%d exact groups, %d near groups' % (len(exact), len(near)))
+
+# Thumbnail Benchmarks
+def render_all(func, keys, *args):
+    return [func(key, *args) for key in keys]
+
+def pixel_difference(images, others):
+    total = 0.0
+    for image, other in zip(images, others):
+        a, b = image.tobytes(), other.tobytes()
+        total += sum(abs(x - y) for x, y in zip(bytearray(a), bytearray(b))) / float(len(a))
+    return total / max(len(images), 1)
+
+def bench_thumbnails(path='files/original.star', size=300):
+    if render is None:
+        print('thumbnails: requires PIL')
+        return
+    keys = load_keys(path)
+    full = max(render.full_size(tuple(key.get('bounds', DEFAULT_BOUNDS)))[0] for key in keys)
+    print('thumbnails: %d levels at %dpx, largest frame %dpx' % (len(keys), size, full))
+    render_all(render.render, keys[:1]) # load sprites
+    reference = timed('render then downscale', render_all, render.render_full, keys, 1, size)
+    direct = timed('direct', render_all, render.render, keys, 1, size)
+    timed('direct, no supersampling', render_all, render.render, keys, 1, size, 1)
+    print('frame pixels %d vs %d, mean difference %.2f/255' % (full * full, size * size,
+        pixel_difference(reference, direct)))
+
+# Bridge Benchmarks
+def repeat(func, count, *args):
+    for index in range(count):
+        result = func(*args)
+    return result
+
+def legacy_wx2pil(image):
+    data = image.GetData() # copy
+    return render.Image.frombytes('RGB', (image.GetWidth(), image.GetHeight()), data) # copy
+
+def legacy_pil2bitmap(image):
+    import wx
+    data = image.convert('RGB').tobytes() # copy, copy
+    image = wx.ImageFromData(image.size[0], image.size[1], data) # copy
+    return wx.BitmapFromImage(image) # copy
+
+def bench_bridge(size=1024, count=50):
+    import wx
+    import bridge
+    if render is None or bridge.numpy is None:
+        print('bridge: requires PIL and numpy')
+        return
+    wx.GetApp() or wx.App(False)
+    print('bridge: %dx%d pixels, %d conversions each' % (size, size, count))
+    image = wx.EmptyImage(size, size)
+    pil = render.Image.new('RGBA', (size, size), (32, 64, 96, 128))
+    array = bridge.numpy.zeros((size, size, 4), bridge.numpy.uint8)
+    timed('wx -> pil, legacy (2 copies)', repeat, legacy_wx2pil, count, image)
+    timed('wx -> pil (1 copy)', repeat, bridge.wx_to_pil, count, image)
+    timed('wx -> numpy (0 copies)', repeat, bridge.wx_array, count, image)
+    timed('pil -> bitmap, legacy (4 copies)', repeat, legacy_pil2bitmap, count, pil)
+    timed('pil -> bitmap (2 copies)', repeat, bridge.pil_to_bitmap, count, pil)
+    timed('numpy -> bitmap (1 copy)', repeat, bridge.array_to_bitmap, count, array)
+    timed('numpy -> wx, rgb (0 copies)', repeat, bridge.array_to_wx, count, array[:, :, :3].copy())
+    view = bridge.wx_array(image)
+    view[0, 0] = (1, 2, 3)
+    print('wx view shares memory: %s' % ((image.GetRed(0, 0), image.GetGreen(0, 0), image.GetBlue(0, 0)) == (1, 2, 3),))
+
+# Level of Detail Benchmarks
+def draw_level(control, size, count):
+    import wx
+    bitmap = wx.EmptyBitmap(*size)
+    dc = wx.MemoryDC(bitmap)
+    for index in range(count):
+        dc.SetBackground(wx.BLACK_BRUSH)
+        dc.Clear()
+        control.draw_level(dc)
+    del dc
+
+def bench_lod(count=20000, scale=0.2, repeats=10):
+    import wx
+    import main
+    wx.GetApp() or wx.App(False)
+    frame = wx.Frame(None)
+    control = main.ScrolledWindow(frame).control
+    level = main.Level()
+    level.entities = random_entities(count)
+    control.set_level(level)
+    l, b, r, t = level.bounds
+    size = (int((r - l) * scale), int((t - b) * scale))
+    control._draw_params = (scale, size)
+    print('lod: %d entities at %.0f%% zoom, %d draws each' % (count, scale * 100, repeats))
+    control.lod_size = 0
+    draw_level(control, size, 1) # fill the bitmap cache
+    timed('bitmaps', draw_level, control, size, repeats)
+    control.lod_size = main.LOD_SIZE
+    timed('dots', draw_level, control, size, repeats)
+    frame.Destroy()
+
+BENCHMARKS = [
+    ('transform', bench_transform),
+    ('duplicates', bench_duplicates),
+    ('thumbnails', bench_thumbnails),
+    ('bridge', bench_bridge),
+    ('lod', bench_lod),
+]
+
+def run(names):
+    for name, func in BENCHMARKS:
+        if not names or name in names:
+            func()
+
+if __name__ == '__main__':
+    run(sys.argv[1:])
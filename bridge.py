@@ -0,0 +1,102 @@
+import wx
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+try:
+    from PIL import Image
+except ImportError:
+    try:
+        import Image
+    except ImportError:
+        Image = None
+
+# wx.Image keeps RGB and alpha in separate planes, wx.Bitmap takes
+# interleaved RGB or RGBA and PIL/NumPy keep everything interleaved.
+# Views share memory with their source and are only valid while it lives.
+
+# wx -> NumPy / PIL
+def wx_array(image):
+    # no copy: a (h, w, 3) view on the image's pixels
+    w, h = image.GetWidth(), image.GetHeight()
+    return numpy.frombuffer(image.GetDataBuffer(), numpy.uint8).reshape(h, w, 3)
+
+def wx_alpha(image):
+    # no copy: a (h, w) view on the alpha plane, or None
+    if not image.HasAlpha():
+        return None
+    w, h = image.GetWidth(), image.GetHeight()
+    return numpy.frombuffer(image.GetAlphaBuffer(), numpy.uint8).reshape(h, w)
+
+def wx_to_pil(image):
+    # one copy for RGB, since PIL pads RGB pixels to four bytes and cannot
+    # share wx's buffer; with alpha, two more to convert and interleave it
+    size = (image.GetWidth(), image.GetHeight())
+    result = Image.frombuffer('RGB', size, image.GetDataBuffer(), 'raw', 'RGB', 0, 1)
+    if image.HasAlpha():
+        alpha = Image.frombuffer('L', size, image.GetAlphaBuffer(), 'raw', 'L', 0, 1)
+        result = result.convert('RGBA')
+        result.putalpha(alpha)
+    return result
+
+def bitmap_array(bitmap):
+    # one copy out of the native bitmap, as (h, w, 4) RGBA
+    w, h = bitmap.GetSize()
+    result = numpy.empty((h, w, 4), numpy.uint8)
+    bitmap.CopyToBuffer(result, wx.BitmapBufferFormat_RGBA)
+    return result
+
+# NumPy / PIL -> wx
+def split_alpha(array):
+    array = numpy.asarray(array, numpy.uint8)
+    if array.ndim == 3 and array.shape[2] == 4:
+        return numpy.ascontiguousarray(array[:, :, :3]), numpy.ascontiguousarray(array[:, :, 3])
+    return numpy.ascontiguousarray(array), None
+
+def array_to_wx(array):
+    # no copy for contiguous RGB; RGBA is copied once, into the two
+    # planes wx uses
+    rgb, alpha = split_alpha(array)
+    h, w = rgb.shape[:2]
+    if alpha is None:
+        image = wx.ImageFromBuffer(w, h, rgb)
+    else:
+        image = wx.ImageFromBuffer(w, h, rgb, alpha)
+    image.buffers = (rgb, alpha) # wx does not own them
+    return image
+
+def array_to_bitmap(array):
+    # one copy, into the native bitmap
+    array = numpy.ascontiguousarray(array, numpy.uint8)
+    h, w = array.shape[:2]
+    if array.ndim == 3 and array.shape[2] == 4:
+        return wx.BitmapFromBufferRGBA(w, h, array)
+    return wx.BitmapFromBuffer(w, h, array)
+
+def pil_rgb(image):
+    if image.mode not in ('RGB', 'RGBA'):
+        image = image.convert('RGBA' if 'A' in image.getbands() else 'RGB')
+    return image
+
+def pil_to_wx(image):
+    # two copies, out of PIL and into wx; alpha adds a conversion and
+    # its own plane
+    image = pil_rgb(image)
+    w, h = image.size
+    if image.mode == 'RGB':
+        return wx.ImageFromData(w, h, image.tobytes())
+    result = wx.ImageFromData(w, h, image.convert('RGB').tobytes())
+    alpha = image.getchannel('A') if hasattr(image, 'getchannel') else image.split()[3]
+    result.SetAlphaData(alpha.tobytes())
+    return result
+
+def pil_to_bitmap(image):
+    # two copies, out of PIL and into the native bitmap; three if the
+    # mode has to be converted first
+    image = pil_rgb(image)
+    w, h = image.size
+    if image.mode == 'RGBA':
+        return wx.BitmapFromBufferRGBA(w, h, image.tobytes())
+    return wx.BitmapFromBuffer(w, h, image.tobytes())
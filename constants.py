@@ -0,0 +1,15 @@
+DEFAULT_NAME = '(Untitled)'
+DEFAULT_BOUNDS = (-240, -160, 240, 160)
+DEFAULT_BOUNDS = (-400, -400, 400, 400)
+DEFAULT_SCALE = 0.5
+
+RADIUS_ASTEROID = 32
+RADIUS_BUMPER = 64
+RADIUS_ITEM = 16
+RADIUS_PLANET = 64
+RADIUS_ROCKET = 20
+RADIUS_STAR = 12
+RADIUS_TELEPORT = 20
+
+PATH_CIRCULAR = 1
+PATH_LINEAR = 2
@@ -0,0 +1,172 @@
+import argparse
+import glob
+import hashlib
+import sys
+import numpy
+import hashing
+from store import load_keys
+
+QUANTUM = 20.0
+NEIGHBORS = 3
+PERMUTATIONS = 64
+BANDS = 16
+THRESHOLD = 0.8
+CHUNK_SIZE = 100000
+
+MASK = (1 << 64) - 1
+MULTIPLIERS = numpy.array([(0x9e3779b97f4a7c15 * (2 * index + 1)) & MASK | 1 for index in range(PERMUTATIONS)], dtype=numpy.uint64)
+OFFSETS = numpy.array([(0xbf58476d1ce4e5b9 * (index + 1)) & MASK for index in range(PERMUTATIONS)], dtype=numpy.uint64)
+
+def mix(values):
+    # splitmix64 finalizer, wrapping in uint64
+    z = values.astype(numpy.uint64)
+    z = (z ^ (z >> numpy.uint64(30))) * numpy.uint64(0xbf58476d1ce4e5b9)
+    z = (z ^ (z >> numpy.uint64(27))) * numpy.uint64(0x94d049bb133111eb)
+    return z ^ (z >> numpy.uint64(31))
+
+def stable(values):
+    codes = [int(hashlib.md5(repr(value).encode('utf-8')).hexdigest()[:16], 16) for value in values]
+    return numpy.array(codes, dtype=numpy.uint64)
+
+def layout(key):
+    kinds = []
+    xs = []
+    ys = []
+    entities = key.get('entities', {})
+    for group in sorted(entities):
+        for entity in entities[group]:
+            path = entity.get('path', None)
+            kinds.append((group, path['type'] if path else 0))
+            xs.append(entity.get('x', 0))
+            ys.append(entity.get('y', 0))
+    return kinds, numpy.array(xs, dtype=float), numpy.array(ys, dtype=float)
+
+def shingles(key, quantum=QUANTUM, neighbors=NEIGHBORS):
+    # each entity paired with its nearest neighbors by type and distance;
+    # invariant to translation, rotation and mirroring
+    kinds, xs, ys = layout(key)
+    names = sorted(set(kinds))
+    types = numpy.array([names.index(kind) for kind in kinds], dtype=numpy.int64)
+    count = len(kinds)
+    if count == 0:
+        return numpy.zeros(0, dtype=numpy.uint64)
+    labels = stable(names)
+    codes = [labels[types]]
+    k = min(neighbors, count - 1)
+    for start in range(0, count, 512) if k else ():
+        stop = min(start + 512, count)
+        d = numpy.hypot(xs[start:stop, numpy.newaxis] - xs, ys[start:stop, numpy.newaxis] - ys)
+        d[numpy.arange(stop - start), numpy.arange(start, stop)] = numpy.inf
+        nearest = numpy.argpartition(d, k - 1, axis=1)[:, :k]
+        rows = numpy.arange(stop - start)[:, numpy.newaxis]
+        q = numpy.floor(d[rows, nearest] / quantum + 0.5).astype(numpy.uint64)
+        a = labels[types[start:stop]][:, numpy.newaxis]
+        b = labels[types[nearest]]
+        codes.append(mix(a ^ mix(b ^ mix(q))).ravel())
+    codes = numpy.sort(numpy.concatenate(codes))
+    # number repeated shingles so that counts matter, not just presence
+    first = numpy.concatenate([[True], codes[1:] != codes[:-1]])
+    starts = numpy.maximum.accumulate(numpy.where(first, numpy.arange(len(codes)), 0))
+    occurrence = (numpy.arange(len(codes)) - starts).astype(numpy.uint64)
+    return mix(codes ^ mix(occurrence))
+
+def signatures(keys, callback=None):
+    result = numpy.empty((len(keys), PERMUTATIONS), dtype=numpy.uint64)
+    result.fill(numpy.iinfo(numpy.uint64).max)
+    batch = []
+    size = 0
+    def flush():
+        values = numpy.concatenate([codes for index, codes in batch])
+        offsets = numpy.cumsum([0] + [len(codes) for index, codes in batch[:-1]])
+        # shingles are already mixed, so multiply-add permutes them well enough
+        hashed = values[:, numpy.newaxis] * MULTIPLIERS + OFFSETS
+        minimums = numpy.minimum.reduceat(hashed, offsets, axis=0)
+        result[[index for index, codes in batch]] = minimums
+        del batch[:]
+    for index, key in enumerate(keys):
+        codes = shingles(key)
+        if len(codes):
+            batch.append((index, codes))
+            size += len(codes)
+        if size >= CHUNK_SIZE:
+            flush()
+            size = 0
+        if callback:
+            callback(index)
+    if batch:
+        flush()
+    return result
+
+def similarity(signature, other):
+    return float(numpy.mean(signature == other))
+
+def find_duplicates(keys, threshold=THRESHOLD, bands=BANDS):
+    # exact: identical content apart from the name
+    groups = {}
+    for index, key in enumerate(keys):
+        digest = hashing.level_hash(dict(key, name=''))
+        groups.setdefault(digest, []).append(index)
+    exact = sorted(indexes for indexes in groups.values() if len(indexes) > 1)
+    representatives = sorted(indexes[0] for indexes in groups.values())
+    # near: minhash signatures bucketed by band, each bucket checked
+    # against its first member and merged, so work stays linear in buckets
+    sigs = signatures([keys[index] for index in representatives])
+    parents = list(range(len(representatives)))
+    def find(i):
+        while parents[i] != i:
+            parents[i] = parents[parents[i]]
+            i = parents[i]
+        return i
+    rows = PERMUTATIONS // bands
+    valid = numpy.nonzero(sigs[:, 0] != numpy.iinfo(numpy.uint64).max)[0]
+    for band in range(bands):
+        if not len(valid):
+            break
+        columns = numpy.ascontiguousarray(sigs[valid, band * rows:(band + 1) * rows])
+        view = columns.view(numpy.dtype((numpy.void, columns.dtype.itemsize * rows))).ravel()
+        dummy, first, inverse = numpy.unique(view, return_index=True, return_inverse=True)
+        anchors = valid[first[inverse.ravel()]]
+        others = valid[anchors != valid]
+        anchors = anchors[anchors != valid]
+        values = numpy.mean(sigs[anchors] == sigs[others], axis=1)
+        for anchor, other in zip(anchors[values >= threshold], others[values >= threshold]):
+            a, b = find(anchor), find(other)
+            if a != b:
+                parents[max(a, b)] = min(a, b)
+    clusters = {}
+    for position in range(len(representatives)):
+        clusters.setdefault(find(position), []).append(position)
+    near = []
+    for members in clusters.values():
+        if len(members) > 1:
+            values = numpy.mean(sigs[members] == sigs[members[0]], axis=1)
+            near.append([(representatives[m], float(v)) for m, v in zip(members, values)])
+    near.sort()
+    return exact, near
+
+# Command Line
+def main(args=None):
+    parser = argparse.ArgumentParser(description='Find duplicate Star Rocket levels.')
+    parser.add_argument('paths', nargs='+', help='.star files (wildcards allowed)')
+    parser.add_argument('-t', '--threshold', type=float, default=THRESHOLD,
+        help='minimum estimated similarity for near duplicates')
+    args = parser.parse_args(args)
+    paths = []
+    for pattern in args.paths:
+        paths.extend(sorted(glob.glob(pattern)) or [pattern])
+    jobs = []
+    for path in paths:
+        for index, key in enumerate(load_keys(path)):
+            jobs.append((path, index, key))
+    def label(job):
+        path, index, key = jobs[job]
+        return '%s:%d (%s)' % (path, index + 1, key.get('name', ''))
+    exact, near = find_duplicates([key for path, index, key in jobs], args.threshold)
+    for indexes in exact:
+        print('exact\t1.000\t%s' % '\t'.join(label(index) for index in indexes))
+    for members in near:
+        print('near\t%s' % '\t'.join('%s %.3f' % (label(index), value) for index, value in members))
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,105 @@
+import math
+import random
+import spatial
+
+class Placer(object):
+    def __init__(self, bounds, obstacles, radius, spacing):
+        l, b, r, t = bounds
+        self.bounds = (l + radius, b + radius, r - radius, t - radius)
+        self.obstacles = obstacles
+        self.radius = radius
+        self.spacing = float(spacing)
+        self.half = self.spacing / 2 - 1e-6
+        self.placed = spatial.Grid(spacing)
+        self.points = []
+    def fits(self, x, y):
+        l, b, r, t = self.bounds
+        if x < l or y < b or x > r or y > t:
+            return False
+        if self.obstacles.overlaps(x, y, self.radius):
+            return False
+        return not self.placed.overlaps(x, y, self.half)
+    def place(self, x, y):
+        if not self.fits(x, y):
+            return False
+        self.placed.insert(len(self.points), x, y, self.half)
+        self.points.append((x, y))
+        return True
+
+def poisson(bounds, spacing, obstacles, radius, limit=None, attempts=30, seed=None):
+    rand = random.Random(seed)
+    placer = Placer(bounds, obstacles, radius, spacing)
+    l, b, r, t = placer.bounds
+    if r < l or t < b:
+        return []
+    active = []
+    while limit is None or len(placer.points) < limit:
+        if not active:
+            for dummy in range(attempts):
+                x, y = rand.uniform(l, r), rand.uniform(b, t)
+                if placer.place(x, y):
+                    active.append((x, y))
+                    break
+            else:
+                break
+            continue
+        index = rand.randrange(len(active))
+        x, y = active[index]
+        for dummy in range(attempts):
+            angle = rand.uniform(0, 2 * math.pi)
+            distance = rand.uniform(spacing, 2 * spacing)
+            nx = x + math.cos(angle) * distance
+            ny = y + math.sin(angle) * distance
+            if placer.place(nx, ny):
+                active.append((nx, ny))
+                break
+        else:
+            active[index] = active[-1]
+            active.pop()
+    return placer.points
+
+def spiral(bounds, spacing, obstacles, radius, cx=0, cy=0):
+    placer = Placer(bounds, obstacles, radius, spacing)
+    l, b, r, t = bounds
+    extent = max(math.hypot(x - cx, y - cy) for x in (l, r) for y in (b, t))
+    angle = 0.0
+    while True:
+        distance = spacing * angle / (2 * math.pi)
+        if distance > extent:
+            break
+        x = cx + math.cos(angle) * distance
+        y = cy + math.sin(angle) * distance
+        placer.place(x, y)
+        angle += spacing / max(distance, spacing)
+    return placer.points
+
+def grid(bounds, spacing, obstacles, radius):
+    placer = Placer(bounds, obstacles, radius, spacing)
+    l, b, r, t = placer.bounds
+    y = b
+    while y <= t:
+        x = l
+        while x <= r:
+            placer.place(x, y)
+            x += spacing
+        y += spacing
+    return placer.points
+
+def along_circle(bounds, spacing, obstacles, radius, cx, cy, distance):
+    placer = Placer(bounds, obstacles, radius, spacing)
+    if distance * 2 <= spacing:
+        count = 1
+    else:
+        count = int(math.pi / math.asin(spacing / (2.0 * distance)))
+    for index in range(count):
+        angle = 2 * math.pi * index / count
+        placer.place(cx + math.cos(angle) * distance, cy + math.sin(angle) * distance)
+    return placer.points
+
+def along_line(bounds, spacing, obstacles, radius, x1, y1, x2, y2):
+    placer = Placer(bounds, obstacles, radius, spacing)
+    count = int(math.hypot(x2 - x1, y2 - y1) / spacing)
+    for index in range(count + 1):
+        k = float(index) / count if count else 0
+        placer.place(x1 + (x2 - x1) * k, y1 + (y2 - y1) * k)
+    return placer.points
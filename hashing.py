@@ -0,0 +1,45 @@
+import hashlib
+import json
+import numbers
+from constants import *
+
+def canonical(value):
+    # numbers hash at full precision, as .star files keep them; only
+    # equal values such as 1 and 1.0 hash alike
+    kind = type(value)
+    if kind is float or kind is int:
+        return repr(float(value))
+    if kind is dict:
+        return {name: canonical(item) for name, item in value.items()}
+    if kind is list or kind is tuple:
+        return [canonical(item) for item in value]
+    if value is None or kind is bool:
+        return value
+    if isinstance(value, numbers.Number):
+        return repr(float(value))
+    return value
+
+def digest(value):
+    data = json.dumps(canonical(value), sort_keys=True, separators=(',', ':'))
+    return hashlib.sha1(data.encode('utf-8')).hexdigest()
+
+def combine(name, bounds, groups):
+    result = hashlib.sha1(digest([name, bounds]).encode('ascii'))
+    for group, hashes in groups:
+        if hashes:
+            result.update(group.encode('ascii'))
+            for value in hashes:
+                result.update(value.encode('ascii'))
+    return result.hexdigest()
+
+def level_hash(key):
+    key = getattr(key, 'key', key)
+    entities = key.get('entities', {})
+    groups = [(group, [digest(entity) for entity in entities[group]]) for group in sorted(entities)]
+    return combine(key.get('name', DEFAULT_NAME), key.get('bounds', DEFAULT_BOUNDS), groups)
+
+def project_hash(hashes):
+    result = hashlib.sha1()
+    for value in hashes:
+        result.update(value.encode('ascii'))
+    return result.hexdigest()
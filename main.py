@@ -2,34 +2,50 @@ import wx
 import wx.aui as aui
 import functools
 import json
-import math
+import multiprocessing
 import os
+import Queue
 import sys
+import threading
+import time
+import traceback
+import bridge
+import generators
+import hashing
 import icons
+import spatial
+import store
+import teleports
+import transform
+import validate
+from constants import *
 
 try:
-    import Image
-except Exception:
-    pass
+    import render
+except ImportError:
+    render = None
+    
+try:
+    import analysis
+    import motion
+    import simulation
+except ImportError:
+    analysis = motion = simulation = None
     
 json.encoder.FLOAT_REPR = lambda x: format(x, '.2f')
 
 TITLE = 'Star Edit'
-DEFAULT_NAME = '(Untitled)'
-DEFAULT_BOUNDS = (-240, -160, 240, 160)
-DEFAULT_BOUNDS = (-400, -400, 400, 400)
-DEFAULT_SCALE = 0.5
 
-RADIUS_ASTEROID = 32
-RADIUS_BUMPER = 64
-RADIUS_ITEM = 16
-RADIUS_PLANET = 64
-RADIUS_ROCKET = 20
-RADIUS_STAR = 12
-RADIUS_TELEPORT = 20
-
-PATH_CIRCULAR = 1
-PATH_LINEAR = 2
+VALIDATION_DELAY = 250
+THUMBNAIL_ICON_SIZE = 48
+THUMBNAIL_SLOTS = 256
+THUMBNAIL_THREADS = 2
+THUMBNAIL_QUEUE = 64
+MINIMAP_SIZE = 200
+MINIMAP_SNAPSHOTS = 8
+LOD_SIZE = 8 # entities smaller than this on screen are drawn as dots
+SELECTED_COLOR = (255, 0, 0)
+PLAYBACK_FPS = 30
 
 # Utility Functions
 def menu_item(window, menu, label, func, icon=None):
@@ -80,28 +96,29 @@ def get_choice(choice):
         return None
     return choice.GetClientData(index)
     
+class Hashed(object):
+    _hash = None
+    def __setattr__(self, name, value):
+        object.__setattr__(self, name, value)
+        if name != '_hash' and self._hash is not None:
+            object.__setattr__(self, '_hash', None)
+            
 def copy_path(src, dest):
     if src.path:
         dest.path = src.path.copy()
     return dest
     
-def wx2pil(image):
-    width, height = image.GetWidth(), image.GetHeight()
-    data = image.GetData()
-    return Image.fromstring('RGB', (width, height), data)
-    
-def pil2wx(image):
-    width, height = image.size
-    data = image.tostring()
-    return wx.ImageFromData(width, height, data)
-    
 # Model Classes
 class Project(object):
     def __init__(self):
         self.levels = [Level()]
+        self.draft = False
     @property
     def key(self):
         return [level.key for level in self.levels]
+    @property
+    def hash(self):
+        return hashing.project_hash(level.hash for level in self.levels)
     @staticmethod
     def from_key(key):
         project = Project()
@@ -111,12 +128,14 @@ class Project(object):
         data = json.dumps(self.key)#, sort_keys=True, indent=4)
         with open(path, 'w') as file:
             file.write(data)
+    def save_draft(self, path):
+        return store.save_manifest(path, self.levels)
     @staticmethod
     def load(path):
-        with open(path, 'r') as file:
-            data = file.read()
-        key = json.loads(data)
-        return Project.from_key(key)
+        key, draft = store.load(path)
+        project = Project.from_key(key)
+        project.draft = draft
+        return project
         
 class Level(object):
     def __init__(self):
@@ -125,6 +144,12 @@ class Level(object):
         self.entities = [Rocket(0, 0)]
     def entities_of_type(self, cls):
         return [entity for entity in self.entities if isinstance(entity, cls)]
+    def entity_groups(self):
+        return dict((name, self.entities_of_type(cls)) for name, cls in ENTITY_TYPES)
+    @property
+    def hash(self):
+        groups = [(name, [entity.hash for entity in self.entities_of_type(cls)]) for name, cls in ENTITY_TYPES]
+        return hashing.combine(self.name, self.bounds, groups)
     def keys_of_type(self, cls):
         result = []
         entities = self.entities_of_type(cls)
@@ -140,6 +165,18 @@ class Level(object):
         level.bounds = self.bounds
         level.entities = [entity.copy() for entity in self.entities]
         return level
+    def validation_items(self):
+        l, b, r, t = self.bounds
+        items = []
+        for entity in self.entities:
+            name = entity.__class__.__name__
+            inside = entity.inside(l, b, r, t)
+            item = validate.Item(name, entity.x, entity.y, entity.radius, entity.solid, inside)
+            if isinstance(entity, Teleport):
+                item.number = entity.number
+                item.target = entity.target
+            items.append(item)
+        return items
     def restore(self, other):
         self.name = other.name
         self.bounds = other.bounds
@@ -167,21 +204,12 @@ class Level(object):
         level.name = key.get('name', DEFAULT_NAME)
         level.bounds = tuple(key.get('bounds', DEFAULT_BOUNDS))
         entities_data = key.get('entities', {})
-        mapping = [
-            ('asteroids', Asteroid),
-            ('bumpers', Bumper),
-            ('items', Item),
-            ('planets', Planet),
-            ('rockets', Rocket),
-            ('stars', Star),
-            ('teleports', Teleport),
-        ]
         path_mapping = {
             PATH_CIRCULAR: CircularPath,
             PATH_LINEAR: LinearPath,
         }
         entities = []
-        for name, cls in mapping:
+        for name, cls in ENTITY_TYPES:
             keys = entities_data.get(name, [])
             for key in keys:
                 entity = cls.from_key(key)
@@ -194,7 +222,8 @@ class Level(object):
         level.entities = entities
         return level
         
-class Entity(object):
+class Entity(Hashed):
+    solid = False
     def __init__(self, x, y):
         self.x = x
         self.y = y
@@ -220,6 +249,15 @@ class Entity(object):
             return False
         return True
     @property
+    def hash(self):
+        path_hash = self.path.hash if self.path else None
+        if self._hash is None or self._hash[0] != path_hash:
+            key = self.key
+            if self.path:
+                key['path'] = self.path.key
+            self._hash = (path_hash, hashing.digest(key))
+        return self._hash[1]
+    @property
     def draw_path_key(self):
         path = self.path
         if isinstance(path, CircularPath):
@@ -230,7 +268,7 @@ class Entity(object):
         else:
             return None
             
-class CircularPath(object):
+class CircularPath(Hashed):
     def __init__(self, x, y, period, clockwise):
         self.x = x
         self.y = y
@@ -253,10 +291,15 @@ class CircularPath(object):
         period = key['period']
         clockwise = key['clockwise']
         return CircularPath(x, y, period, clockwise)
+    @property
+    def hash(self):
+        if self._hash is None:
+            self._hash = hashing.digest(self.key)
+        return self._hash
     def copy(self):
         return CircularPath(self.x, self.y, self.period, self.clockwise)
         
-class LinearPath(object):
+class LinearPath(Hashed):
     def __init__(self, x, y, period):
         self.x = x
         self.y = y
@@ -276,11 +319,17 @@ class LinearPath(object):
         y = key['y']
         period = key['period']
         return LinearPath(x, y, period)
+    @property
+    def hash(self):
+        if self._hash is None:
+            self._hash = hashing.digest(self.key)
+        return self._hash
     def copy(self):
         return LinearPath(self.x, self.y, self.period)
         
 class Rocket(Entity):
     radius = RADIUS_ROCKET
+    color = (255, 255, 255)
     @property
     def image(self):
         return icons.rocket.GetImage()
@@ -303,6 +352,8 @@ class Rocket(Entity):
         return copy_path(self, Rocket(self.x, self.y))
         
 class Planet(Entity):
+    solid = True
+    color = (64, 128, 255)
     def __init__(self, x, y, scale, sprite):
         super(Planet, self).__init__(x, y)
         self.scale = scale
@@ -345,6 +396,8 @@ class Planet(Entity):
         return copy_path(self, Planet(self.x, self.y, self.scale, self.sprite))
         
 class Bumper(Entity):
+    solid = True
+    color = (255, 128, 0)
     def __init__(self, x, y, scale):
         super(Bumper, self).__init__(x, y)
         self.scale = scale
@@ -375,6 +428,8 @@ class Bumper(Entity):
         return copy_path(self, Bumper(self.x, self.y, self.scale))
         
 class Asteroid(Entity):
+    solid = True
+    color = (160, 128, 96)
     def __init__(self, x, y, scale):
         super(Asteroid, self).__init__(x, y)
         self.scale = scale
@@ -406,6 +461,7 @@ class Asteroid(Entity):
         
 class Item(Entity):
     radius = RADIUS_ITEM
+    color = (0, 224, 96)
     def __init__(self, x, y, type):
         super(Item, self).__init__(x, y)
         self.type = type
@@ -439,6 +495,7 @@ class Item(Entity):
         
 class Teleport(Entity):
     radius = RADIUS_TELEPORT
+    color = (192, 64, 255)
     def __init__(self, x, y, number, target):
         super(Teleport, self).__init__(x, y)
         self.number = number
@@ -470,6 +527,7 @@ class Teleport(Entity):
         
 class Star(Entity):
     radius = RADIUS_STAR
+    color = (255, 216, 0)
     @property
     def image(self):
         return icons.coin.GetImage()
@@ -491,6 +549,16 @@ class Star(Entity):
     def copy(self):
         return copy_path(self, Star(self.x, self.y))
         
+ENTITY_TYPES = [
+    ('asteroids', Asteroid),
+    ('bumpers', Bumper),
+    ('items', Item),
+    ('planets', Planet),
+    ('rockets', Rocket),
+    ('stars', Star),
+    ('teleports', Teleport),
+]
+
 # View Classes
 EVT_ENTITY_DCLICK = wx.PyEventBinder(wx.NewEventType())
 EVT_LEVEL_ADD = wx.PyEventBinder(wx.NewEventType())
@@ -506,12 +574,103 @@ class Event(wx.PyEvent):
         self.SetEventType(type.typeId)
         self.SetEventObject(event_object)
         
+class Worker(threading.Thread):
+    def __init__(self):
+        super(Worker, self).__init__()
+        self.jobs = Queue.Queue()
+        self.setDaemon(True)
+        self.start()
+    def submit(self, func, *args):
+        self.jobs.put((func, args))
+    def run(self):
+        while True:
+            func, args = self.jobs.get()
+            try:
+                func(*args)
+            except Exception:
+                traceback.print_exc()
+                
+class Preview(threading.Thread):
+    def __init__(self):
+        super(Preview, self).__init__()
+        self.condition = threading.Condition()
+        self.request = None
+        self.generation = 0
+        self.setDaemon(True)
+        self.start()
+    def submit(self, func, *args):
+        with self.condition:
+            self.generation += 1
+            self.request = (self.generation, func, args)
+            self.condition.notify()
+    def run(self):
+        while True:
+            with self.condition:
+                while self.request is None:
+                    self.condition.wait()
+                generation, func, args = self.request
+                self.request = None
+            cancelled = lambda: generation != self.generation
+            try:
+                func(cancelled, *args)
+            except Exception:
+                traceback.print_exc()
+                
+class ThumbnailLoader(object):
+    # renders thumbnails on worker threads, newest requests first;
+    # requests past the queue limit have scrolled away and are dropped
+    def __init__(self, callback, size, threads=THUMBNAIL_THREADS):
+        self.callback = callback
+        self.size = size
+        self.condition = threading.Condition()
+        self.requests = []
+        self.pending = set()
+        for index in range(threads):
+            thread = threading.Thread(target=self.run)
+            thread.setDaemon(True)
+            thread.start()
+    def submit(self, digest, key):
+        with self.condition:
+            if digest in self.pending:
+                return
+            self.pending.add(digest)
+            self.requests.append((digest, key))
+            if len(self.requests) > THUMBNAIL_QUEUE:
+                stale, dummy = self.requests.pop(0)
+                self.pending.discard(stale)
+            self.condition.notify()
+    def run(self):
+        while True:
+            with self.condition:
+                while not self.requests:
+                    self.condition.wait()
+                digest, key = self.requests.pop()
+            try:
+                image = render.get_cache().image(key, 1, self.size, digest)
+                wx.CallAfter(self.callback, digest, image)
+            except Exception:
+                traceback.print_exc()
+            finally:
+                with self.condition:
+                    self.pending.discard(digest)
+                    
 class Frame(wx.Frame):
     def __init__(self):
         super(Frame, self).__init__(None, -1, TITLE)
         self.project = None
         self._path = None
         self._unsaved = False
+        self.saved_hash = None
+        self.draft = False
+        self.exports = {}
+        self.worker = Worker()
+        self.live_validation = True
+        self.validate_all = False
+        self.validation_timer = None
+        self.pending_validation = set()
+        self.validators = {}
+        self.problems = {}
+        self.path_problems = {}
         self.create_manager()
         self.create_menu()
         self.create_statusbar()
@@ -528,6 +687,14 @@ class Frame(wx.Frame):
         index = self.notebook.GetSelection()
         window = self.notebook.GetPage(index)
         return window.control
+    def get_window(self):
+        index = self.notebook.GetSelection()
+        return self.notebook.GetPage(index) if index >= 0 else None
+    @property
+    def level(self):
+        if self.notebook.GetSelection() < 0:
+            return None
+        return self.control.level
     def set_default_size(self):
         w = wx.SystemSettings_GetMetric(wx.SYS_SCREEN_X)
         h = wx.SystemSettings_GetMetric(wx.SYS_SCREEN_Y)
@@ -556,6 +723,30 @@ class Frame(wx.Frame):
         info.BestSize(size)
         info.FloatingSize(size)
         self.manager.AddPane(self.level_view, info)
+        # Problem List
+        self.problem_list = self.create_problem_list(self)
+        info = aui.AuiPaneInfo()
+        info.Name('problem_list')
+        info.Bottom()
+        info.Caption('Problems')
+        size = (-1, 128)
+        info.MinSize(size)
+        info.BestSize(size)
+        info.FloatingSize((512, 128))
+        info.Hide()
+        self.manager.AddPane(self.problem_list, info)
+        # Minimap
+        self.minimap = Minimap(self)
+        info = aui.AuiPaneInfo()
+        info.Name('minimap')
+        info.Right()
+        info.Caption('Minimap')
+        size = (MINIMAP_SIZE + 16, MINIMAP_SIZE + 16)
+        info.MinSize(size)
+        info.BestSize(size)
+        info.FloatingSize(size)
+        info.Hide()
+        self.manager.AddPane(self.minimap, info)
         # Toolbar
         toolbar = self.create_toolbar()
         info = aui.AuiPaneInfo()
@@ -576,6 +767,7 @@ class Frame(wx.Frame):
         notebook = aui.AuiNotebook(parent, -1, style=style)
         notebook.SetUniformBitmapSize((21, 21))
         notebook.Bind(aui.EVT_AUINOTEBOOK_PAGE_CLOSED, self.on_page_closed)
+        notebook.Bind(aui.EVT_AUINOTEBOOK_PAGE_CHANGED, self.on_page_changed)
         return notebook
     def create_level_view(self, parent):
         level_view = LevelView(parent)
@@ -591,6 +783,10 @@ class Frame(wx.Frame):
         level_view.Bind(EVT_LEVEL_MOVE_DOWN, self.on_level_move_down)
         level_view.Bind(EVT_LEVEL_PROPERTES, self.on_level_properties)
         return level_view
+    def create_problem_list(self, parent):
+        problem_list = ProblemList(parent)
+        problem_list.Bind(wx.EVT_LIST_ITEM_SELECTED, self.on_problem_selected)
+        return problem_list
     def create_menu(self):
         menubar = wx.MenuBar()
         # File
@@ -600,11 +796,13 @@ class Frame(wx.Frame):
         menu.AppendSeparator()
         menu_item(self, menu, 'Save\tCtrl+S', self.on_save, icons.disk)
         menu_item(self, menu, 'Save As...\tCtrl+Shift+S', self.on_save_as)
+        menu_item(self, menu, 'Save Draft...', self.on_save_draft)
         menu.AppendSeparator()
         menu_item(self, menu, 'Import Levels...', self.on_import)
         menu_item(self, menu, 'Export Levels...', self.on_export)
         menu_item(self, menu, 'Export Bitmap...', self.on_export_bitmap)
         menu_item(self, menu, 'Export All Bitmaps...', self.on_export_all_bitmaps)
+        menu_item(self, menu, 'Export Thumbnail Atlas...', self.on_export_atlas)
         menu.AppendSeparator()
         menu_item(self, menu, 'Exit\tAlt+F4', self.on_exit, icons.door_out)
         menubar.Append(menu, '&File')
@@ -634,7 +832,16 @@ class Frame(wx.Frame):
         menu_item(self, menu, 'Show Grid', self.on_show_grid)
         menu_item(self, menu, 'Snap to Grid', self.on_snap_to_grid)
         menu.AppendSeparator()
+        menu_item(self, menu, 'Show Trajectory', self.on_show_trajectory, icons.icon_rocket)
+        menu_item(self, menu, 'Aim Angle...', self.on_aim_angle)
+        menu_item(self, menu, 'Show Gravity Field', self.on_show_field)
+        menu_item(self, menu, 'Play Paths', self.on_play_paths)
+        menu_item(self, menu, 'Show Teleport Links', self.on_show_links, icons.icon_teleport)
+        menu_item(self, menu, 'Detail Threshold...', self.on_detail_threshold)
+        menu.AppendSeparator()
         menu_item(self, menu, 'Show Levels', self.on_show_levels)
+        menu_item(self, menu, 'Show Problems', self.on_show_problems)
+        menu_item(self, menu, 'Show Minimap', self.on_show_minimap)
         menu.AppendSeparator()
         for zoom in range(1, 5):
             func = functools.partial(self.on_zoom, zoom=zoom)
@@ -659,15 +866,33 @@ class Frame(wx.Frame):
         func = functools.partial(self.on_mirror, mx=-1, my=-1)
         menu_item(self, menu, 'Mirror (Both)', func)
         menu_item(self, menu, 'Rotate...', self.on_rotate)
+        menu_item(self, menu, 'Rotate About...', self.on_rotate_about)
+        menu_item(self, menu, 'Scale About...', self.on_scale_about)
+        menu_item(self, menu, 'Flip About Axis...', self.on_flip_about)
         menu_item(self, menu, 'Inset', self.on_inset, icons.arrow_in)
         menu_item(self, menu, 'Outset', self.on_outset, icons.arrow_out)
         menu.AppendSeparator()
         menu_item(self, menu, 'Linear Array...', self.on_linear_array, icons.arrow_left)
         menu_item(self, menu, 'Circular Array...', self.on_circular_array, icons.arrow_rotate_anticlockwise)
         menu.AppendSeparator()
+        menu_item(self, menu, 'Scatter Stars...', self.on_scatter_stars, icons.icon_star)
+        menu_item(self, menu, 'Spiral Stars...', self.on_spiral_stars)
+        menu_item(self, menu, 'Grid Fill Stars...', self.on_grid_stars)
+        menu_item(self, menu, 'Stars Along Path...', self.on_path_stars)
+        menu.AppendSeparator()
         menu_item(self, menu, 'Linear Path...', self.on_linear_path, icons.arrow_left)
         menu_item(self, menu, 'Circular Path...', self.on_circular_path, icons.arrow_rotate_anticlockwise)
         menu_item(self, menu, 'Delete Path', self.on_delete_path, icons.cross)
+        menu.AppendSeparator()
+        menu_item(self, menu, 'Renumber Teleports', self.on_renumber_teleports, icons.icon_teleport)
+        menu.AppendSeparator()
+        menu_item(self, menu, 'Validate Level', self.on_validate_level)
+        menu_item(self, menu, 'Validate Project', self.on_validate_project)
+        menu_item(self, menu, 'Validate While Editing', self.on_live_validation)
+        menu.AppendSeparator()
+        menu_item(self, menu, 'Simulate Level', self.on_simulate_level, icons.icon_rocket)
+        menu_item(self, menu, 'Check Paths', self.on_check_paths)
+        menu_item(self, menu, 'Analyze Project', self.on_analyze_project)
         menubar.Append(menu, '&Tools')
         self.SetMenuBar(menubar)
     def create_toolbar(self):
@@ -719,20 +944,65 @@ class Frame(wx.Frame):
         info = self.manager.GetPane(view)
         info.Show(not info.IsShown())
         self.manager.Update()
+    def show_view(self, view):
+        info = self.manager.GetPane(view)
+        if not info.IsShown():
+            info.Show()
+            self.manager.Update()
+    # Validation Functions
+    def validate(self, levels):
+        for level in levels:
+            validator = self.validators.setdefault(level, validate.Validator())
+            items = dict(zip(level.entities, level.validation_items()))
+            self.worker.submit(self.run_validation, level, validator, items)
+    def run_validation(self, level, validator, items):
+        validator.update(items)
+        problems = [(level, problem.message, problem.keys) for problem in validator.problems()]
+        wx.CallAfter(self.on_validated, level, problems)
+    def on_validated(self, level, problems):
+        if not self or level not in self.project.levels:
+            return
+        self.problems[level] = problems
+        self.update_problems()
+    def schedule_validation(self, level):
+        self.pending_validation.add(level)
+        if self.validation_timer is None:
+            self.validation_timer = wx.CallLater(VALIDATION_DELAY, self.on_validation_timer)
+        else:
+            self.validation_timer.Restart(VALIDATION_DELAY)
+    def on_validation_timer(self):
+        levels = [level for level in self.project.levels if level in self.pending_validation]
+        self.pending_validation.clear()
+        self.validate(levels)
+    def update_problems(self):
+        if self.validate_all:
+            levels = self.project.levels
+        else:
+            levels = [self.level] if self.level else []
+        problems = []
+        for level in levels:
+            problems.extend(self.problems.get(level, []))
+            problems.extend(self.path_problems.get(level, []))
+        self.problem_list.set_problems(self.project, problems)
+        self.SetStatusText('%d problem(s) found' % len(problems))
     # Notebook Functions
     def close_pages(self):
         self.notebook.Freeze()
         for dummy in range(self.notebook.GetPageCount()):
             self.notebook.DeletePage(0)
         self.notebook.Thaw()
+        self.minimap.set_window(None)
     def close_page(self, level):
         index = self.get_page_index(level)
         if index >= 0:
             self.notebook.DeletePage(index)
+            self.minimap.set_window(self.get_window())
     def show_page(self, level, focus=True):
         index = self.get_page_index(level)
         if index < 0:
-            self.create_page(level, focus)
+            window = self.create_page(level, focus)
+            if not focus:
+                self.notebook.SetSelection(self.notebook.GetPageIndex(window))
         else:
             self.notebook.SetSelection(index)
             if focus:
@@ -773,6 +1043,11 @@ class Frame(wx.Frame):
     def set_project(self, project):
         self.project = project
         self.level_view.set_project(project)
+        self.validators = {}
+        self.problems = {}
+        self.path_problems = {}
+        self.pending_validation.clear()
+        self.problem_list.set_problems(project, [])
         self.close_pages()
         for level in project.levels:
             self.show_page(level)
@@ -781,14 +1056,47 @@ class Frame(wx.Frame):
         self.path = None
         project = Project()
         self.set_project(project)
+        self.saved_hash = None
+        self.draft = False
         self.unsaved = False
     def open(self, path):
         self.path = path
         project = Project.load(path)
         self.set_project(project)
+        self.saved_hash = project.hash
+        self.draft = project.draft
         self.unsaved = False
+    def save(self, path, draft=None):
+        draft = self.draft if draft is None else draft
+        digest = self.project.hash
+        if path != self.path or draft != self.draft or digest != self.saved_hash or not os.path.exists(path):
+            if draft:
+                count = self.project.save_draft(path)
+                self.SetStatusText('%d new level(s) stored' % count)
+            else:
+                self.project.save(path)
+        self.draft = draft
+        self.path = path
+        self.saved_hash = digest
+        self.unsaved = False
+    def export_needed(self, path, digest):
+        if not os.path.exists(path):
+            return True
+        return self.exports.get(path) != (digest, os.path.getmtime(path))
+    def exported(self, path, digest):
+        self.exports[path] = (digest, os.path.getmtime(path))
     def on_page_closed(self, event):
-        pass
+        self.minimap.set_window(self.get_window())
+    def on_page_changed(self, event):
+        event.Skip()
+        index = event.GetOldSelection()
+        if index >= 0 and index < self.notebook.GetPageCount():
+            self.notebook.GetPage(index).control.stop()
+        level = self.level
+        if level and self.live_validation and level not in self.problems:
+            self.schedule_validation(level)
+        self.update_problems()
+        self.minimap.set_window(self.get_window())
     def confirm_close(self):
         if self.unsaved:
             dialog = wx.MessageDialog(self, 'Save changes before closing?', 'Unsaved Changes', wx.YES_NO | wx.CANCEL | wx.YES_DEFAULT | wx.ICON_EXCLAMATION)
@@ -871,56 +1179,132 @@ class Frame(wx.Frame):
             for index, level in enumerate(self.project.levels):
                 name = 'level%d.star' % (index + start)
                 path = os.path.join(base, name)
+                digest = level.hash
+                if not self.export_needed(path, digest):
+                    continue
                 project = Project()
                 project.levels = [level.copy()]
                 project.save(path)
+                self.exported(path, digest)
         finally:
             dialog.Destroy()
     def on_save(self, event):
         if self.path:
-            self.project.save(self.path)
-            self.unsaved = False
+            self.save(self.path)
             return True
         else:
             return self.on_save_as(None)
-    def on_save_as(self, event):
+    def on_save_as(self, event, draft=False):
         dialog = wx.FileDialog(self, 'Save', wildcard='*.star', style=wx.FD_SAVE|wx.FD_OVERWRITE_PROMPT)
         if dialog.ShowModal() == wx.ID_OK:
             path = dialog.GetPath()
-            self.path = path
-            self.project.save(path)
-            self.unsaved = False
+            self.save(path, draft)
             dialog.Destroy()
             return True
         else:
             dialog.Destroy()
             return False
+    def on_save_draft(self, event):
+        return self.on_save_as(event, True)
     def on_export_bitmap(self, event):
+        level = self.level
+        if level is None:
+            return
         dialog = wx.FileDialog(self, 'Save', wildcard='*.png', style=wx.FD_SAVE|wx.FD_OVERWRITE_PROMPT)
         if dialog.ShowModal() == wx.ID_OK:
             path = dialog.GetPath()
-            bitmap = self.control.create_bitmap()
-            bitmap.SaveFile(path, wx.BITMAP_TYPE_PNG)
+            self.save_thumbnail(level, path)
         dialog.Destroy()
+    def save_thumbnail(self, level, path):
+        if render:
+            render.save_image(render.get_cache().image(level), path)
+            return
+        self.show_page(level)
+        bitmap = self.control.create_bitmap()
+        bitmap.SaveFile(path, wx.BITMAP_TYPE_PNG)
     def on_export_all_bitmaps(self, event):
         dialog = wx.DirDialog(self, 'Select Directory', style=wx.DD_DEFAULT_STYLE|wx.DD_DIR_MUST_EXIST)
         try:
             if dialog.ShowModal() != wx.ID_OK:
                 return
             start = self.get_string('Enter start number:', '1')
+            resolutions = self.get_string('Enter resolutions (e.g. 1,2,4):', '1') if render else '1'
             try:
                 start = int(start)
+                resolutions = render.parse_resolutions(resolutions) if render else [1]
             except Exception:
                 return
             base = dialog.GetPath()
+        finally:
+            dialog.Destroy()
+        if render is None:
             for index, level in enumerate(self.project.levels):
-                self.show_page(level)
-                name = 'thumb%d.png' % (index + start)
-                path = os.path.join(base, name)
-                bitmap = self.control.create_bitmap()
-                bitmap.SaveFile(path, wx.BITMAP_TYPE_PNG)
+                self.save_thumbnail(level, os.path.join(base, 'thumb%d.png' % (index + start)))
+            return
+        export = functools.partial(render.export_folder, folder=base, start=start, cache=render.get_cache().root,
+            resolutions=resolutions)
+        self.start_thumbnail_export('Export All Bitmaps', export)
+    def on_export_atlas(self, event):
+        if render is None:
+            self.show_message('Atlas export requires PIL.')
+            return
+        dialog = wx.DirDialog(self, 'Select Directory', style=wx.DD_DEFAULT_STYLE|wx.DD_DIR_MUST_EXIST)
+        try:
+            if dialog.ShowModal() != wx.ID_OK:
+                return
+            start = self.get_string('Enter start number:', '1')
+            page_size = self.get_string('Enter page size:', render.ATLAS_PAGE_SIZE)
+            try:
+                start = int(start)
+                page_size = int(page_size)
+            except Exception:
+                return
+            base = dialog.GetPath()
         finally:
             dialog.Destroy()
+        export = functools.partial(render.export_atlas, folder=base, start=start, page_size=page_size,
+            cache=render.get_cache().root)
+        self.start_thumbnail_export('Export Thumbnail Atlas', export)
+    def start_thumbnail_export(self, title, export):
+        keys = [level.key for level in self.project.levels]
+        style = wx.PD_APP_MODAL | wx.PD_CAN_ABORT | wx.PD_ELAPSED_TIME | wx.PD_REMAINING_TIME
+        progress = wx.ProgressDialog(title, 'Rendering thumbnails...', max(len(keys), 1), self, style)
+        state = {'cancelled': False, 'done': 0, 'error': None}
+        thread = threading.Thread(target=self.run_thumbnail_export, args=(export, keys, progress, state))
+        thread.setDaemon(True)
+        thread.start()
+    def run_thumbnail_export(self, export, keys, progress, state):
+        def callback(index, total):
+            wx.CallAfter(self.on_thumbnail_exported, progress, state, total, len(keys))
+            return not state['cancelled']
+        try:
+            export(keys, callback=callback)
+        except Exception as e:
+            traceback.print_exc()
+            state['error'] = str(e)
+        finally:
+            wx.CallAfter(self.on_thumbnails_exported, progress, state, len(keys))
+    def on_thumbnail_exported(self, progress, state, total, count):
+        state['done'] += 1
+        if not progress or state['cancelled']:
+            return
+        # unchanged levels count as already done
+        value = min(count - total + state['done'], count)
+        result = progress.Update(value, '%d of %d thumbnails rendered' % (state['done'], total))
+        if not (result[0] if isinstance(result, tuple) else result):
+            state['cancelled'] = True
+    def on_thumbnails_exported(self, progress, state, total):
+        if progress:
+            progress.Destroy()
+        if not self:
+            return
+        skipped = total - state['done']
+        if state['error']:
+            self.show_message('Export failed: %s' % state['error'])
+        elif state['cancelled']:
+            self.SetStatusText('Export cancelled')
+        else:
+            self.SetStatusText('%d thumbnail(s) rendered, %d unchanged' % (state['done'], skipped))
     def on_level_activated(self, event):
         level = self.level_view.level_list.get_level()
         if level:
@@ -996,10 +1380,142 @@ class Frame(wx.Frame):
     def on_snap_to_grid(self, event):
         self.control.snap_to_grid = not self.control.snap_to_grid
         self.control.Refresh()
+    def on_show_trajectory(self, event):
+        if simulation is None:
+            self.show_message('Trajectory preview requires NumPy.')
+            return
+        self.control.show_trajectory = not self.control.show_trajectory
+        self.control.update_trajectory()
+        self.control.Refresh()
+    def on_play_paths(self, event):
+        if motion is None:
+            self.show_message('Path playback requires NumPy.')
+            return
+        if self.control.playback:
+            self.control.stop()
+        elif not self.control.play():
+            self.SetStatusText('Level has no moving entities')
+    def on_show_links(self, event):
+        self.control.show_links = not self.control.show_links
+        self.control.Refresh()
+    def on_aim_angle(self, event):
+        angle = self.get_string('Enter aim angle (degrees):', self.control.aim)
+        try:
+            angle = float(angle)
+        except Exception:
+            return
+        self.control.aim = angle
+        self.control.update_trajectory()
+    def on_detail_threshold(self, event):
+        size = self.get_string('Draw entities smaller than this as dots (pixels):', self.control.lod_size)
+        try:
+            size = float(size)
+        except Exception:
+            return
+        self.control.lod_size = size
+        self.control.Refresh()
+    def on_show_field(self, event):
+        if simulation is None:
+            self.show_message('Gravity field requires NumPy.')
+            return
+        self.control.show_field = not self.control.show_field
+        self.control.Refresh()
     def on_zoom(self, event, zoom):
         self.control.set_scale(zoom)
     def on_show_levels(self, event):
         self.toggle_view(self.level_view)
+    def on_show_problems(self, event):
+        self.toggle_view(self.problem_list)
+    def on_show_minimap(self, event):
+        if render is None:
+            self.show_message('The minimap requires PIL.')
+            return
+        self.toggle_view(self.minimap)
+        self.minimap.update()
+    def on_live_validation(self, event):
+        self.live_validation = not self.live_validation
+    def on_validate_level(self, event):
+        self.validate_all = False
+        self.validate([self.control.level])
+        self.show_view(self.problem_list)
+    def on_validate_project(self, event):
+        self.validate_all = True
+        self.validate(self.project.levels)
+        self.show_view(self.problem_list)
+    def on_simulate_level(self, event):
+        if simulation is None:
+            self.show_message('Simulation requires NumPy.')
+            return
+        level = self.control.level
+        self.SetStatusText('Simulating...')
+        self.worker.submit(self.run_simulation, level.name, level.key)
+    def run_simulation(self, name, key):
+        lines = []
+        for index, result in enumerate(simulation.sweep(key)):
+            complete = result.complete.mean() * 100
+            best = result.stars.max()
+            lines.append('Rocket %d: best %d of %d stars, %.0f%% of launches collect all stars' % (index + 1, best, result.total, complete))
+        if not lines:
+            lines.append('Level has no rockets.')
+        wx.CallAfter(self.on_simulated, name, lines)
+    def on_simulated(self, name, lines):
+        if not self:
+            return
+        self.SetStatusText('')
+        self.show_message('\n'.join(lines), 'Simulation - %s' % name)
+    def on_check_paths(self, event):
+        if motion is None:
+            self.show_message('Path checking requires NumPy.')
+            return
+        level = self.control.level
+        self.SetStatusText('Checking paths...')
+        self.worker.submit(self.run_path_check, level, level.key, level.entity_groups())
+    def run_path_check(self, level, key, groups):
+        report = motion.collisions(key)
+        problems = []
+        for collision in report.collisions:
+            entities = [groups[kind][index] for kind, index in (report.refs[collision.a], report.refs[collision.b])]
+            problems.append((level, collision.describe(report.names), entities))
+        wx.CallAfter(self.on_paths_checked, level, report, problems)
+    def on_paths_checked(self, level, report, problems):
+        if not self or level not in self.project.levels:
+            return
+        self.path_problems[level] = problems
+        self.validate_all = False
+        self.update_problems()
+        self.show_view(self.problem_list)
+        if report.truncated:
+            self.SetStatusText('%d path collision(s) found in the first %g seconds' % (len(problems), report.period))
+        else:
+            self.SetStatusText('%d path collision(s) found over %g seconds' % (len(problems), report.period))
+    def on_analyze_project(self, event):
+        if analysis is None:
+            self.show_message('Analysis requires NumPy.')
+            return
+        levels = list(self.project.levels)
+        keys = [level.key for level in levels]
+        self.SetStatusText('Analyzing...')
+        thread = threading.Thread(target=self.run_analysis, args=(levels, keys))
+        thread.setDaemon(True)
+        thread.start()
+    def run_analysis(self, levels, keys):
+        def callback(index, metrics):
+            wx.CallAfter(self.on_analyzed, levels[index], metrics)
+        analysis.analyze_project(keys, callback=callback)
+        wx.CallAfter(self.SetStatusText, '')
+    def on_analyzed(self, level, metrics):
+        if not self:
+            return
+        if level in self.project.levels:
+            self.level_view.set_metrics(level, metrics)
+    def on_problem_selected(self, event):
+        problem = self.problem_list.get_problem()
+        if problem:
+            level, message, entities = problem
+            if level in self.project.levels:
+                self.show_page(level, False)
+                page = self.notebook.GetPage(self.get_page_index(level))
+                page.control.select_entities(entities)
     def on_rocket(self, event):
         entity = Rocket(0, 0)
         self.control.add_entity(entity)
@@ -1034,6 +1550,33 @@ class Frame(wx.Frame):
         except Exception:
             return
         self.control.rotate(angle)
+    def on_rotate_about(self, event):
+        angle = self.get_string('Enter angle (degrees):')
+        try:
+            angle = float(angle)
+        except Exception:
+            return
+        pivot = self.get_pivot()
+        if pivot:
+            self.control.rotate(angle, *pivot)
+    def on_scale_about(self, event):
+        factor = self.get_string('Enter scale factor:', '1')
+        try:
+            factor = float(factor)
+        except Exception:
+            return
+        pivot = self.get_pivot()
+        if pivot:
+            self.control.scale_selection(factor, *pivot)
+    def on_flip_about(self, event):
+        angle = self.get_string('Enter axis angle (degrees):', '90')
+        try:
+            angle = float(angle)
+        except Exception:
+            return
+        pivot = self.get_pivot()
+        if pivot:
+            self.control.flip(angle, *pivot)
     def on_linear_array(self, event):
         count = self.get_string('Enter count:')
         try:
@@ -1048,6 +1591,24 @@ class Frame(wx.Frame):
         except Exception:
             return
         self.control.circular_array(count)
+    def on_scatter_stars(self, event):
+        spacing = self.get_spacing()
+        if spacing:
+            self.control.scatter_stars(spacing)
+    def on_spiral_stars(self, event):
+        spacing = self.get_spacing()
+        if spacing:
+            pivot = self.get_pivot()
+            if pivot:
+                self.control.spiral_stars(spacing, *pivot)
+    def on_grid_stars(self, event):
+        spacing = self.get_spacing()
+        if spacing:
+            self.control.grid_stars(spacing)
+    def on_path_stars(self, event):
+        spacing = self.get_spacing()
+        if spacing:
+            self.control.path_stars(spacing)
     def on_linear_path(self, event):
         entities = list(self.control.selection)
         dialog = LinearPathDialog(self, entities)
@@ -1062,10 +1623,17 @@ class Frame(wx.Frame):
         dialog.Destroy()
     def on_delete_path(self, event):
         self.control.delete_path()
+    def on_renumber_teleports(self, event):
+        self.control.renumber_teleports()
     def on_control_changed(self, event):
         self.unsaved = True
         level = event.GetEventObject().level
-        self.level_view.update_level(level)
+        self.level_view.set_metrics(level, None)
+        self.path_problems.pop(level, None)
+        if self.live_validation:
+            self.schedule_validation(level)
+        if level is self.level:
+            self.minimap.update()
     def on_entity_dclick(self, event):
         entities = event.entities
         if all(isinstance(entity, Planet) for entity in entities):
@@ -1096,6 +1664,27 @@ class Frame(wx.Frame):
             result = None
         dialog.Destroy()
         return result
+    def show_message(self, message, title=TITLE):
+        dialog = wx.MessageDialog(self, message, title, wx.OK | wx.ICON_INFORMATION)
+        dialog.ShowModal()
+        dialog.Destroy()
+    def get_spacing(self):
+        spacing = self.get_string('Enter spacing:', RADIUS_STAR * 3)
+        try:
+            spacing = float(spacing)
+        except Exception:
+            return None
+        if spacing <= 0:
+            return None
+        return spacing
+    def get_pivot(self):
+        x, y = transform.center(self.control.selection)
+        value = self.get_string('Enter pivot (x, y):', '%g, %g' % (x, y))
+        try:
+            x, y = [float(part) for part in value.split(',')]
+        except Exception:
+            return None
+        return x, y
         
 class BaseDialog(wx.Dialog):
     def __init__(self, parent, title):
@@ -1323,20 +1912,72 @@ class LevelList(wx.ListCtrl):
     INDEX_NUMBER = 0
     INDEX_NAME = 1
     INDEX_STARS = 2
+    INDEX_SOLVABLE = 3
+    INDEX_BEST = 4
+    INDEX_SENSITIVITY = 5
     def __init__(self, parent):
         style = wx.LC_REPORT | wx.LC_VIRTUAL | wx.LC_SINGLE_SEL
         super(LevelList, self).__init__(parent, -1, style=style)
         self.project = None
+        self.metrics = {}
         change_font(self, 10)
         self.InsertColumn(LevelList.INDEX_NUMBER, '#')
         self.InsertColumn(LevelList.INDEX_NAME, 'Name')
         self.InsertColumn(LevelList.INDEX_STARS, 'Stars')
+        self.InsertColumn(LevelList.INDEX_SOLVABLE, 'Solvable')
+        self.InsertColumn(LevelList.INDEX_BEST, 'Best')
+        self.InsertColumn(LevelList.INDEX_SENSITIVITY, 'Sensitivity')
         self.SetColumnWidth(LevelList.INDEX_NUMBER, 32)
         self.SetColumnWidth(LevelList.INDEX_NAME, 128)
         self.SetColumnWidth(LevelList.INDEX_STARS, 48)
+        self.SetColumnWidth(LevelList.INDEX_SOLVABLE, 64)
+        self.SetColumnWidth(LevelList.INDEX_BEST, 48)
+        self.SetColumnWidth(LevelList.INDEX_SENSITIVITY, 72)
+        self.loader = None
+        if render:
+            self.create_thumbnails()
+    def create_thumbnails(self):
+        size = THUMBNAIL_ICON_SIZE
+        self.thumbnails = wx.ImageList(size, size)
+        placeholder = wx.EmptyBitmap(size, size)
+        dc = wx.MemoryDC(placeholder)
+        dc.SetBackground(wx.BLACK_BRUSH)
+        dc.Clear()
+        del dc
+        self.thumbnails.Add(placeholder)
+        self.SetImageList(self.thumbnails, wx.IMAGE_LIST_SMALL)
+        self.slots = {}
+        self.slot_order = []
+        self.loader = ThumbnailLoader(self.on_thumbnail, size)
+    def on_thumbnail(self, digest, image):
+        if not self:
+            return
+        bitmap = bridge.pil_to_bitmap(image)
+        if digest in self.slots:
+            slot = self.slots[digest]
+            self.slot_order.remove(digest)
+            self.thumbnails.Replace(slot, bitmap)
+        elif len(self.slot_order) < THUMBNAIL_SLOTS:
+            slot = self.thumbnails.Add(bitmap)
+        else:
+            slot = self.slots.pop(self.slot_order.pop(0))
+            self.thumbnails.Replace(slot, bitmap)
+        self.slots[digest] = slot
+        self.slot_order.append(digest)
+        top = self.GetTopItem()
+        bottom = min(top + self.GetCountPerPage(), self.GetItemCount() - 1)
+        if bottom >= top:
+            self.RefreshItems(top, bottom)
     def set_project(self, project):
         self.project = project
+        self.metrics = {}
         self.update()
+    def set_metrics(self, level, metrics):
+        if metrics is None:
+            self.metrics.pop(level, None)
+        else:
+            self.metrics[level] = metrics
+        self.update_level(level)
     def update(self):
         count = 0
         if self.project:
@@ -1362,6 +2003,23 @@ class LevelList(wx.ListCtrl):
         if len(levels) == 1:
             return levels[0]
         return None
+    def OnGetItemImage(self, index):
+        # only called for visible rows, so only those are rendered
+        if not self.loader or not self.project:
+            return -1
+        levels = self.project.levels
+        if index < 0 or index >= len(levels):
+            return -1
+        level = levels[index]
+        digest = level.hash
+        slot = self.slots.get(digest)
+        if slot is None:
+            if digest not in self.loader.pending:
+                self.loader.submit(digest, level.key)
+            return 0
+        self.slot_order.remove(digest)
+        self.slot_order.append(digest)
+        return slot
     def OnGetItemText(self, index, column):
         if self.project:
             levels = self.project.levels
@@ -1374,6 +2032,49 @@ class LevelList(wx.ListCtrl):
                 if column == LevelList.INDEX_STARS:
                     count = len(level.entities_of_type(Star))
                     return '%d' % count
+                metrics = self.metrics.get(level)
+                if metrics:
+                    if column == LevelList.INDEX_SOLVABLE:
+                        return '%.0f%%' % (metrics['solvable'] * 100)
+                    if column == LevelList.INDEX_BEST:
+                        return '%d' % metrics['best']
+                    if column == LevelList.INDEX_SENSITIVITY:
+                        return '%.2f' % metrics['sensitivity']
+        return ''
+        
+class ProblemList(wx.ListCtrl):
+    INDEX_LEVEL = 0
+    INDEX_PROBLEM = 1
+    def __init__(self, parent):
+        style = wx.LC_REPORT | wx.LC_VIRTUAL | wx.LC_SINGLE_SEL
+        super(ProblemList, self).__init__(parent, -1, style=style)
+        self.project = None
+        self.problems = []
+        change_font(self, 10)
+        self.InsertColumn(ProblemList.INDEX_LEVEL, 'Level')
+        self.InsertColumn(ProblemList.INDEX_PROBLEM, 'Problem')
+        self.SetColumnWidth(ProblemList.INDEX_LEVEL, 160)
+        self.SetColumnWidth(ProblemList.INDEX_PROBLEM, 480)
+    def set_problems(self, project, problems):
+        self.project = project
+        self.problems = problems
+        self.SetItemCount(len(problems))
+        self.Refresh()
+    def get_problem(self):
+        index = self.GetNextItem(-1, wx.LIST_NEXT_ALL, wx.LIST_STATE_SELECTED)
+        if index >= 0 and index < len(self.problems):
+            return self.problems[index]
+        return None
+    def OnGetItemText(self, index, column):
+        if index >= 0 and index < len(self.problems):
+            level, message, entities = self.problems[index]
+            if column == ProblemList.INDEX_LEVEL:
+                levels = self.project.levels if self.project else []
+                if level in levels:
+                    return '%d. %s' % (levels.index(level) + 1, level.name)
+                return level.name
+            if column == ProblemList.INDEX_PROBLEM:
+                return message
         return ''
         
 class LevelView(wx.Panel):
@@ -1392,6 +2093,8 @@ class LevelView(wx.Panel):
         self.level_list.update()
     def update_level(self, level):
         self.level_list.update_level(level)
+    def set_metrics(self, level, metrics):
+        self.level_list.set_metrics(level, metrics)
     def create_toolbar(self):
         style= wx.HORIZONTAL | wx.TB_FLAT | wx.TB_NODIVIDER
         toolbar = wx.ToolBar(self, -1, style=style)
@@ -1433,6 +2136,127 @@ class ScrolledWindow(wx.ScrolledWindow):
         self.EnableScrolling(True, True)
         self.SetScrollRate(25, 25)
         
+class Minimap(wx.Panel):
+    # a small render of the current level, patched from change
+    # notifications; the rectangle shows the view and drags it around
+    def __init__(self, parent):
+        super(Minimap, self).__init__(parent, -1)
+        self.window = None
+        self.snapshots = {}
+        self.order = []
+        self.bitmap = None
+        self.shown = None
+        self.viewport = None
+        self.dragging = False
+        self.SetBackgroundStyle(wx.BG_STYLE_CUSTOM)
+        self.Bind(wx.EVT_SIZE, self.on_size)
+        self.Bind(wx.EVT_PAINT, self.on_paint)
+        self.Bind(wx.EVT_IDLE, self.on_idle)
+        self.Bind(wx.EVT_LEFT_DOWN, self.on_left_down)
+        self.Bind(wx.EVT_LEFT_UP, self.on_left_up)
+        self.Bind(wx.EVT_MOTION, self.on_motion)
+        self.Bind(wx.EVT_MOUSE_CAPTURE_LOST, self.on_mouse_capture_lost)
+    @property
+    def control(self):
+        return self.window.control if self.window else None
+    @property
+    def snapshot(self):
+        control = self.control
+        return self.snapshots.get(control.level) if control else None
+    def set_window(self, window):
+        self.window = window
+        self.update()
+    def get_snapshot(self, level):
+        snapshot = self.snapshots.get(level)
+        if snapshot is None:
+            snapshot = self.snapshots[level] = render.Snapshot(MINIMAP_SIZE)
+        else:
+            self.order.remove(level)
+        self.order.append(level)
+        while len(self.order) > MINIMAP_SNAPSHOTS:
+            del self.snapshots[self.order.pop(0)]
+        return snapshot
+    def update(self):
+        if render is None or not self.IsShown():
+            return
+        control = self.control
+        if control is None:
+            self.bitmap = self.shown = None
+        else:
+            level = control.level
+            snapshot = self.get_snapshot(level)
+            groups = level.entity_groups()
+            digests = [entity.hash for name in sorted(groups) for entity in groups[name]]
+            region = snapshot.update(level.key, digests)
+            if region or snapshot is not self.shown:
+                self.bitmap = bridge.pil_to_bitmap(snapshot.image)
+                self.shown = snapshot
+        self.Refresh()
+    # Conversion Functions
+    def get_offset(self):
+        w, h = self.GetClientSize()
+        bw, bh = self.bitmap.GetSize()
+        return (w - bw) / 2, (h - bh) / 2
+    def get_viewport(self):
+        snapshot = self.snapshot
+        if self.bitmap is None or snapshot is not self.shown:
+            return None
+        window, control, canvas = self.window, self.control, snapshot.canvas
+        ux, uy = window.GetScrollPixelsPerUnit()
+        vx, vy = window.GetViewStart()
+        w, h = window.GetClientSize()
+        x, y = vx * ux, vy * uy
+        dx, dy = self.get_offset()
+        l, t = canvas.cc2wx(*control.wx2cc(x, y))
+        r, b = canvas.cc2wx(*control.wx2cc(x + w, y + h))
+        return (int(l + dx), int(t + dy), int(r - l), int(b - t))
+    def scroll_to(self, x, y):
+        snapshot = self.snapshot
+        if self.bitmap is None or snapshot is not self.shown:
+            return
+        window, control = self.window, self.control
+        dx, dy = self.get_offset()
+        x, y = control.cc2wx(*snapshot.canvas.wx2cc(x - dx, y - dy))
+        ux, uy = window.GetScrollPixelsPerUnit()
+        w, h = window.GetClientSize()
+        window.Scroll(int(max(x - w / 2, 0) / max(ux, 1)), int(max(y - h / 2, 0) / max(uy, 1)))
+        self.Refresh()
+    # Event Handlers
+    def on_size(self, event):
+        event.Skip()
+        self.Refresh()
+    def on_idle(self, event):
+        # the view also moves on scrollbars, the mouse wheel and zooming
+        if self.IsShown() and self.get_viewport() != self.viewport:
+            self.Refresh()
+    def on_paint(self, event):
+        dc = wx.AutoBufferedPaintDC(self)
+        dc.SetBackground(wx.BLACK_BRUSH)
+        dc.Clear()
+        self.viewport = None
+        if self.bitmap is None:
+            return
+        dc.DrawBitmap(self.bitmap, *self.get_offset())
+        self.viewport = self.get_viewport()
+        if self.viewport:
+            dc.SetPen(wx.Pen(wx.Colour(255, 0, 0), 1))
+            dc.SetBrush(wx.TRANSPARENT_BRUSH)
+            dc.DrawRectangle(*self.viewport)
+    def on_left_down(self, event):
+        if self.bitmap is not None:
+            self.dragging = True
+            self.CaptureMouse()
+            self.scroll_to(*event.GetPosition())
+    def on_motion(self, event):
+        if self.dragging:
+            self.scroll_to(*event.GetPosition())
+    def on_left_up(self, event):
+        self.dragging = False
+        if self.HasCapture():
+            self.ReleaseMouse()
+    def on_mouse_capture_lost(self, event):
+        self.dragging = False
+        
 class BitmapCache(object):
     def __init__(self):
         self.cache = {}
@@ -1465,17 +2289,39 @@ class BitmapCache(object):
             dc.DrawCircle(x, y, radius)
         return bitmap
         
+class Insertion(object):
+    def __init__(self, entities):
+        self.entities = [entity.copy() for entity in entities]
+    def copy_entities(self):
+        return [entity.copy() for entity in self.entities]
+        
 class Control(wx.Panel):
     clipboard = set()
     cache = BitmapCache()
+    preview = None
     def __init__(self, parent):
         super(Control, self).__init__(parent, -1, style=wx.WANTS_CHARS)
+        if Control.preview is None:
+            Control.preview = Preview()
         self._draw_params = None # (scale, (width, height))
         self.scale = 1
         self.minor_grid = (10, 10)
         self.major_grid = (100, 100) #(120, 80)
         self.show_grid = True
         self.snap_to_grid = True
+        self.show_trajectory = False
+        self.show_field = False
+        self.field_bitmap = None
+        self.aim = 90.0
+        self.lod_size = LOD_SIZE
+        self.trajectory = []
+        self.show_links = True
+        self.network = teleports.Network()
+        self.link_geometry = None
+        self.playback = None
+        self.positions = {}
+        self.update_region = None
+        self.timer = wx.Timer(self)
         self.cursor = (0, 0)
         self.selection = set()
         self.reset_controls()
@@ -1491,6 +2337,7 @@ class Control(wx.Panel):
         self.Bind(wx.EVT_MOUSEWHEEL, self.on_mousewheel)
         self.Bind(wx.EVT_MOUSE_CAPTURE_LOST, self.on_mouse_capture_lost)
         self.Bind(wx.EVT_KEY_DOWN, self.on_key_down)
+        self.Bind(wx.EVT_TIMER, self.on_timer, self.timer)
     @property
     def draw_params(self):
         return self._draw_params or (self.scale, self.GetClientSize())
@@ -1499,7 +2346,11 @@ class Control(wx.Panel):
         self.Refresh()
     def on_paint(self, event):
         dc = wx.AutoBufferedPaintDC(self)
+        if self.playback:
+            self.update_region = self.GetUpdateRegion()
+            dc.SetClippingRegionAsRegion(self.update_region)
         self.draw(dc)
+        self.update_region = None
     def set_scale(self, scale):
         self.scale = scale
         self.update_min_size()
@@ -1558,8 +2409,25 @@ class Control(wx.Panel):
         w, h = dc.GetTextExtent(text)
         x, y = self.cc2wx(x, y)
         dc.DrawText(text, x - w / 2, y - h / 2)
+    def visible(self, x, y, w, h):
+        # whether a window rectangle meets the region being repainted
+        region = self.update_region
+        if not region:
+            return True
+        return region.ContainsRect(wx.Rect(int(x), int(y), int(w) + 1, int(h) + 1)) != wx.OutRegion
+    def visible_bounds(self):
+        # the level bounds cut down to the region being repainted
+        l, b, r, t = self.level.bounds
+        if self.update_region:
+            box = self.update_region.GetBox()
+            vl, vt = self.wx2cc(box.x, box.y)
+            vr, vb = self.wx2cc(box.x + box.width, box.y + box.height)
+            l, b, r, t = max(l, vl), max(b, vb), min(r, vr), min(t, vt)
+        return l, b, r, t
     # Drawing Functions
     def create_bitmap(self, scale=1, size=300):
+        if render:
+            return bridge.pil_to_bitmap(render.get_cache().image(self.level, scale, size))
         l, b, r, t = self.level.bounds
         w, h = r - l, t - b
         if size: # make square
@@ -1574,20 +2442,43 @@ class Control(wx.Panel):
         del dc
         if size: # scale to size
             image = wx.ImageFromBitmap(bitmap)
-            try:
-                image = wx2pil(image)
-                image = image.resize((size, size), Image.ANTIALIAS)
-                image = pil2wx(image)
-            except Exception:
-                image.Rescale(size, size, wx.IMAGE_QUALITY_HIGH)
+            image.Rescale(size, size, wx.IMAGE_QUALITY_HIGH)
             bitmap = wx.BitmapFromImage(image)
         return bitmap
     def draw(self, dc):
         dc.SetBackground(wx.BLACK_BRUSH)
         dc.Clear()
+        self.draw_field(dc)
         self.draw_grid(dc)
         self.draw_level(dc)
+        self.draw_links(dc)
+        self.draw_trajectory(dc)
         self.draw_selection(dc)
+    def draw_field(self, dc):
+        if not self.show_field or simulation is None:
+            return
+        key = {
+            'bounds': self.level.bounds,
+            'entities': {'planets': self.level.keys_of_type(Planet)},
+        }
+        digest = simulation.field_hash(key)
+        if self.field_bitmap is None or self.field_bitmap[0] != digest:
+            field = simulation.get_field(key)
+            rgb = field.heatmap()
+            self.field_bitmap = (digest, field, bridge.array_to_bitmap(rgb))
+        digest, field, bitmap = self.field_bitmap
+        scale, dummy = self.draw_params
+        step = field.step
+        w, h = bitmap.GetSize()
+        x, y = self.cc2wx(field.xs[0] - step / 2, field.ys[-1] + step / 2)
+        l, b, r, t = self.visible_bounds()
+        if l >= r or b >= t:
+            return
+        cl, ct = self.cc2wx(l, t)
+        cr, cb = self.cc2wx(r, b)
+        gc = wx.GraphicsContext.Create(dc)
+        gc.Clip(cl, ct, cr - cl, cb - ct)
+        gc.DrawBitmap(bitmap, x, y, w * step * scale, h * step * scale)
     def draw_grid(self, dc):
         l, b, r, t = self.level.bounds
         dc.SetBrush(wx.TRANSPARENT_BRUSH)
@@ -1602,22 +2493,26 @@ class Control(wx.Panel):
         if not self.show_grid:
             return
         xstep, ystep = step
-        l, b, r, t = self.level.bounds
+        l, b, r, t = self.visible_bounds()
         x = 0
         while x >= l:
-            self.line(dc, x, b, x, t)
+            if x <= r:
+                self.line(dc, x, b, x, t)
             x -= xstep
         x = 0
         while x <= r:
-            self.line(dc, x, b, x, t)
+            if x >= l:
+                self.line(dc, x, b, x, t)
             x += xstep
         y = 0
         while y >= b:
-            self.line(dc, l, y, r, y)
+            if y <= t:
+                self.line(dc, l, y, r, y)
             y -= ystep
         y = 0
         while y <= t:
-            self.line(dc, l, y, r, y)
+            if y >= b:
+                self.line(dc, l, y, r, y)
             y += ystep
     def draw_selection(self, dc):
         if self.selecting:
@@ -1635,8 +2530,33 @@ class Control(wx.Panel):
                 self.draw_path(dc, entity)
                 if key:
                     keys.add(key)
+        dots = {}
         for entity in self.level.entities:
-            self.draw_entity(dc, entity)
+            if not self.add_dot(dots, entity):
+                self.draw_entity(dc, entity)
+        self.draw_dots(dc, dots)
+    def draw_links(self, dc):
+        if not self.show_links:
+            return
+        version = self.network.version
+        if self.link_geometry is None or self.link_geometry[0] != version:
+            self.link_geometry = (version, teleports.arrows(self.network, RADIUS_TELEPORT))
+        lines = []
+        for x1, y1, x2, y2 in self.link_geometry[1]:
+            x1, y1 = self.cc2wx(x1, y1)
+            x2, y2 = self.cc2wx(x2, y2)
+            if self.visible(min(x1, x2), min(y1, y2), abs(x2 - x1), abs(y2 - y1)):
+                lines.append((int(x1), int(y1), int(x2), int(y2)))
+        if lines:
+            dc.SetPen(wx.Pen(wx.Colour(0, 192, 255), 1))
+            dc.DrawLineList(lines)
+    def draw_trajectory(self, dc):
+        if not self.show_trajectory or len(self.trajectory) < 2:
+            return
+        points = [self.cc2wx(x, y) for x, y in self.trajectory]
+        points = [(int(x), int(y)) for x, y in points]
+        dc.SetPen(wx.Pen(wx.Colour(0, 255, 0), 1, wx.DOT))
+        dc.DrawLines(points)
     def draw_path(self, dc, entity):
         path = entity.path
         dc.SetPen(wx.Pen(wx.WHITE, 1, wx.DOT))
@@ -1645,51 +2565,151 @@ class Control(wx.Panel):
             dx = entity.x - path.x
             dy = entity.y - path.y
             radius = (dx * dx + dy * dy) ** 0.5
-            self.circle(dc, path.x, path.y, radius)
+            x, y, size = self.cc2wx(path.x, path.y, radius)
+            if self.visible(x - size, y - size, 2 * size, 2 * size):
+                self.circle(dc, path.x, path.y, radius)
         elif isinstance(path, LinearPath):
             dx = entity.x - path.x
             dy = entity.y - path.y
-            self.line(dc, entity.x, entity.y, entity.x - dx * 2, entity.y - dy * 2)
+            x1, y1 = self.cc2wx(entity.x, entity.y)
+            x2, y2 = self.cc2wx(entity.x - dx * 2, entity.y - dy * 2)
+            if self.visible(min(x1, x2), min(y1, y2), abs(x2 - x1), abs(y2 - y1)):
+                self.line(dc, entity.x, entity.y, entity.x - dx * 2, entity.y - dy * 2)
     def draw_entity(self, dc, entity):
         scale, dummy = self.draw_params
         selected = entity in self.selection
         bitmap = Control.cache.get_bitmap(entity, scale, selected)
         w, h = bitmap.GetSize()
-        x, y = self.cc2wx(entity.x, entity.y)
+        x, y = self.positions.get(entity, (entity.x, entity.y))
+        x, y = self.cc2wx(x, y)
+        if self.update_region and self.update_region.ContainsRect(wx.Rect(x - w / 2, y - h / 2, w, h)) == wx.OutRegion:
+            return
         dc.DrawBitmap(bitmap, x - w / 2, y - h / 2, True)
+    def dot_radius(self, entity):
+        # on-screen radius if the entity is too small to be worth a bitmap
+        scale, dummy = self.draw_params
+        radius = entity.radius * scale
+        if 2 * radius < self.lod_size:
+            return radius
+        return None
+    def add_dot(self, dots, entity):
+        radius = self.dot_radius(entity)
+        if radius is None:
+            return False
+        x, y = self.positions.get(entity, (entity.x, entity.y))
+        x, y = self.cc2wx(x, y)
+        if not self.visible(x - radius - 1, y - radius - 1, 2 * radius + 2, 2 * radius + 2):
+            return True
+        color = SELECTED_COLOR if entity in self.selection else entity.color
+        points, ellipses = dots.setdefault(color, ([], []))
+        if radius < 1:
+            points.append((int(x), int(y)))
+        else:
+            size = int(2 * radius)
+            ellipses.append((int(x - radius), int(y - radius), size, size))
+        return True
+    def draw_dots(self, dc, dots):
+        # one batched call per color instead of a bitmap per entity
+        for color, (points, ellipses) in dots.items():
+            colour = wx.Colour(*color)
+            dc.SetPen(wx.Pen(colour, 1))
+            dc.SetBrush(wx.Brush(colour))
+            if points:
+                dc.DrawPointList(points)
+            if ellipses:
+                dc.DrawEllipseList(ellipses)
+    def entity_rect(self, entity):
+        radius = self.dot_radius(entity)
+        if radius is not None:
+            x, y = self.positions.get(entity, (entity.x, entity.y))
+            x, y = self.cc2wx(x, y)
+            size = int(2 * radius) + 4
+            return wx.Rect(int(x - radius) - 2, int(y - radius) - 2, size, size)
+        scale, dummy = self.draw_params
+        bitmap = Control.cache.get_bitmap(entity, scale, entity in self.selection)
+        w, h = bitmap.GetSize()
+        x, y = self.positions.get(entity, (entity.x, entity.y))
+        x, y = self.cc2wx(x, y)
+        return wx.Rect(x - w / 2 - 1, y - h / 2 - 1, w + 2, h + 2)
+    # Playback Functions
+    def play(self):
+        entities = [entity for entity in self.level.entities if entity.path and entity.path.period > 0]
+        if not entities:
+            return False
+        keys = []
+        for entity in entities:
+            key = entity.key
+            key['path'] = entity.path.key
+            keys.append(key)
+        self.playback = (entities, motion.Playback(keys, PLAYBACK_FPS), time.time())
+        self.timer.Start(1000 / PLAYBACK_FPS)
+        return True
+    def stop(self):
+        if self.playback is None:
+            return
+        self.timer.Stop()
+        self.playback = None
+        self.positions = {}
+        self.Refresh()
+    def on_timer(self, event):
+        if self.playback is None:
+            return
+        entities, playback, start = self.playback
+        xs, ys = playback.positions(time.time() - start)
+        for entity, x, y in zip(entities, xs, ys):
+            rect = self.entity_rect(entity)
+            self.positions[entity] = (float(x), float(y))
+            self.RefreshRect(rect.Union(self.entity_rect(entity)), False)
     # Model Functions
     def set_level(self, level):
+        self.stop()
         self.level = level
+        self.network.reset()
+        self.update_network()
+        self.link_geometry = None
         self.selection.clear()
+        self.trajectory = []
         self.update_min_size()
         self.clear_undo_buffer()
         self.mark()
+        self.update_trajectory()
         self.Refresh()
-    def restore_level(self, level):
+    def restore_level(self, level, insertions=()):
         self.level.restore(level)
+        for insertion in insertions:
+            self.level.entities.extend(insertion.copy_entities())
         self.selection.clear()
         self.changed(False)
+    def restore_state(self, index):
+        start = index
+        while isinstance(self.undo_buffer[start], Insertion):
+            start -= 1
+        level = self.undo_buffer[start]
+        insertions = self.undo_buffer[start + 1:index + 1]
+        self.restore_level(level, insertions)
     def changed(self, mark=True):
+        self.stop()
         if mark:
             self.mark()
+        self.update_network()
+        self.update_trajectory()
         self.Refresh()
         event = Event(self, EVT_CONTROL_CHANGED)
         wx.PostEvent(self, event)
-    def mark(self):
-        level = self.level.copy()
+    def mark(self, record=None):
+        if record is None:
+            record = self.level.copy()
         del self.undo_buffer[self.undo_index + 1:]
-        self.undo_buffer.append(level)
+        self.undo_buffer.append(record)
         self.undo_index = len(self.undo_buffer) - 1
     def undo(self):
         if self.can_undo():
             self.undo_index -= 1
-            level = self.undo_buffer[self.undo_index]
-            self.restore_level(level)
+            self.restore_state(self.undo_index)
     def redo(self):
         if self.can_redo():
             self.undo_index += 1
-            level = self.undo_buffer[self.undo_index]
-            self.restore_level(level)
+            self.restore_state(self.undo_index)
     def can_undo(self):
         return bool(self.undo_buffer) and self.undo_index > 0
     def can_redo(self):
@@ -1700,6 +2720,13 @@ class Control(wx.Panel):
     def add_entity(self, entity):
         self.level.entities.append(entity)
         self.changed()
+    def insert_entities(self, entities):
+        if not entities:
+            return
+        self.level.entities.extend(entities)
+        self.selection = set(entities)
+        self.mark(Insertion(entities))
+        self.changed(False)
     def cut(self):
         self.copy()
         self.delete()
@@ -1707,9 +2734,7 @@ class Control(wx.Panel):
         Control.clipboard = set(entity.copy() for entity in self.selection)
     def paste(self):
         entities = [entity.copy() for entity in Control.clipboard]
-        self.selection = set(entities)
-        self.level.entities.extend(entities)
-        self.changed()
+        self.insert_entities(entities)
     def duplicate(self):
         self.copy()
         self.paste()
@@ -1718,6 +2743,10 @@ class Control(wx.Panel):
             self.level.entities.remove(entity)
         self.selection.clear()
         self.changed()
+    def select_entities(self, entities):
+        present = set(self.level.entities)
+        self.selection = set(entity for entity in entities if entity in present)
+        self.Refresh()
     def select_all(self, cls=None):
         entities = set()
         for entity in self.level.entities:
@@ -1726,14 +2755,17 @@ class Control(wx.Panel):
             entities.add(entity)
         self.selection = entities
         self.Refresh()
-    def mirror(self, mx, my):
-        for entity in self.selection:
-            entity.x *= mx
-            entity.y *= my
-            if entity.path:
-                entity.path.x *= mx
-                entity.path.y *= my
+    def apply_transform(self, matrix):
+        transform.transform(self.selection, matrix)
         self.changed()
+    def mirror(self, mx, my):
+        self.apply_transform(transform.scaling(mx, my))
+    def flip(self, degrees, cx=0, cy=0):
+        self.apply_transform(transform.reflection(degrees, cx, cy))
+    def rotate(self, degrees, cx=0, cy=0):
+        self.apply_transform(transform.rotation(degrees, cx, cy))
+    def scale_selection(self, factor, cx=0, cy=0):
+        self.apply_transform(transform.scaling(factor, factor, cx, cy))
     def inset(self):
         step = min(self.minor_grid)
         self._do_set(-step)
@@ -1741,62 +2773,91 @@ class Control(wx.Panel):
         step = min(self.minor_grid)
         self._do_set(step)
     def _do_set(self, dr):
-        for entity in self.selection:
-            entity.x, entity.y = self._add_radius(entity.x, entity.y, dr)
-            if entity.path:
-                entity.path.x, entity.path.y = self._add_radius(entity.path.x, entity.path.y, dr)
-        self.changed()
-    def _add_radius(self, x, y, dr):
-        if x == 0 and y == 0:
-            return x, y
-        radius = (x * x + y * y) ** 0.5
-        radius += dr
-        angle = math.atan2(y, x)
-        x = math.cos(angle) * radius
-        y = math.sin(angle) * radius
-        return x, y
-    def rotate(self, degrees):
-        for entity in self.selection:
-            entity.x, entity.y = self._rotate(entity.x, entity.y, degrees)
-            if entity.path:
-                entity.path.x, entity.path.y = self._rotate(entity.path.x, entity.path.y, degrees)
+        transform.offset(self.selection, dr)
         self.changed()
-    def _rotate(self, x, y, degrees):
-        if x == 0 and y == 0:
-            return x, y
-        d = (x * x + y * y) ** 0.5
-        angle = math.atan2(y, x)
-        angle = angle + math.radians(degrees)
-        x = math.cos(angle) * d
-        y = math.sin(angle) * d
-        return x, y
     def linear_array(self, count):
-        for entity in self.selection:
-            x = entity.x
-            y = entity.y
-            if x == 0 and y == 0:
-                continue
-            dx = x / float(count - 1)
-            dy = y / float(count - 1)
-            for i in range(1, count):
-                other = entity.copy()
-                other.x -= dx * i
-                other.y -= dy * i
-                if other.path:
-                    other.path.x -= dx * i
-                    other.path.y -= dy * i
-                self.level.entities.append(other)
-        self.changed()
+        entities = transform.linear_array(self.selection, count)
+        self.insert_entities(entities)
     def circular_array(self, count):
-        step = 360.0 / count
+        entities = transform.circular_array(self.selection, count)
+        self.insert_entities(entities)
+    def get_rocket_index(self):
+        rockets = self.level.entities_of_type(Rocket)
+        for index, rocket in enumerate(rockets):
+            if rocket in self.selection:
+                return index
+        return 0 if rockets else None
+    def update_trajectory(self):
+        if not self.show_trajectory or simulation is None:
+            return
+        index = self.get_rocket_index()
+        if index is None:
+            self.trajectory = []
+            return
+        Control.preview.submit(self.compute_trajectory, self.level.key, index, self.aim)
+    def compute_trajectory(self, cancelled, key, index, aim):
+        # the preview traces the unsteered flight of the launch
+        points = simulation.trajectory(key, index, aim, cancelled=cancelled, pilot=False)
+        if points is not None and not cancelled():
+            wx.CallAfter(self.set_trajectory, points)
+    def set_trajectory(self, points):
+        if not self:
+            return
+        self.trajectory = points
+        self.Refresh()
+    def get_obstacles(self):
+        grid = spatial.Grid(RADIUS_PLANET)
+        for entity in self.level.entities:
+            if entity.solid:
+                grid.insert(entity, entity.x, entity.y, entity.radius)
+        return grid
+    def insert_stars(self, points):
+        entities = [Star(x, y) for x, y in points]
+        self.insert_entities(entities)
+    def scatter_stars(self, spacing):
+        obstacles = self.get_obstacles()
+        points = generators.poisson(self.level.bounds, spacing, obstacles, RADIUS_STAR)
+        self.insert_stars(points)
+    def spiral_stars(self, spacing, cx=0, cy=0):
+        obstacles = self.get_obstacles()
+        points = generators.spiral(self.level.bounds, spacing, obstacles, RADIUS_STAR, cx, cy)
+        self.insert_stars(points)
+    def grid_stars(self, spacing):
+        obstacles = self.get_obstacles()
+        points = generators.grid(self.level.bounds, spacing, obstacles, RADIUS_STAR)
+        self.insert_stars(points)
+    def path_stars(self, spacing):
+        obstacles = self.get_obstacles()
+        bounds = self.level.bounds
+        points = []
         for entity in self.selection:
-            for i in range(1, count):
-                degrees = step * i
-                other = entity.copy()
-                other.x, other.y = self._rotate(other.x, other.y, degrees)
-                if other.path:
-                    other.path.x, other.path.y = self._rotate(other.path.x, other.path.y, degrees)
-                self.level.entities.append(other)
+            path = entity.path
+            if isinstance(path, CircularPath):
+                dx = entity.x - path.x
+                dy = entity.y - path.y
+                radius = (dx * dx + dy * dy) ** 0.5
+                points.extend(generators.along_circle(bounds, spacing, obstacles, RADIUS_STAR, path.x, path.y, radius))
+            elif isinstance(path, LinearPath):
+                dx = entity.x - path.x
+                dy = entity.y - path.y
+                points.extend(generators.along_line(bounds, spacing, obstacles, RADIUS_STAR, entity.x, entity.y, entity.x - dx * 2, entity.y - dy * 2))
+        self.insert_stars(points)
+    def update_network(self):
+        # called whenever entities change, so painting never has to
+        items = {}
+        for entity in self.level.entities_of_type(Teleport):
+            items[entity] = validate.Item('Teleport', entity.x, entity.y, entity.radius, number=entity.number, target=entity.target)
+        self.network.update(items)
+    def renumber_teleports(self):
+        self.update_network()
+        entities = [entity for entity in self.selection if isinstance(entity, Teleport)]
+        entities = entities or self.level.entities_of_type(Teleport)
+        changes = self.network.renumber(entities)
+        if all((entity.number, entity.target) == value for entity, value in changes.items()):
+            return
+        for entity, (number, target) in changes.items():
+            entity.number = number
+            entity.target = target
         self.changed()
     def delete_path(self):
         for entity in self.selection:
@@ -1864,13 +2925,7 @@ class Control(wx.Panel):
             if not event.CmdDown():
                 dx *= self.minor_grid[0]
                 dy *= self.minor_grid[1]
-            for entity in self.selection:
-                entity.x += dx
-                entity.y += dy
-                if entity.path:
-                    entity.path.x += dx
-                    entity.path.y += dy
-            self.changed()
+            self.apply_transform(transform.translation(dx, dy))
     def on_left_double(self, event):
         x, y = event.GetPosition()
         x, y = self.wx2cc(x, y)
@@ -1881,6 +2936,7 @@ class Control(wx.Panel):
             wx.PostEvent(self, event)
     def on_left_down(self, event):
         self.SetFocus()
+        self.stop()
         x, y = event.GetPosition()
         x, y = self.wx2cc(x, y)
         self.cursor = (x, y)
@@ -1926,6 +2982,7 @@ class Control(wx.Panel):
                     self.changed()
                     break
         self.reset_controls()
+        self.update_trajectory()
         self.Refresh()
     def on_motion(self, event):
         x, y = event.GetPosition()
@@ -1943,6 +3000,9 @@ class Control(wx.Panel):
                 if entity.path and original_path:
                     entity.path.x = original_path.x + mx
                     entity.path.y = original_path.y + my
+            if any(isinstance(entity, Teleport) for entity, sx, sy, original_path in self.moving):
+                self.update_network()
+            self.update_trajectory()
             self.Refresh()
         if self.selecting:
             self.Refresh()
@@ -1955,5 +3015,5 @@ def main():
     app.MainLoop()
     
 if __name__ == '__main__':
+    multiprocessing.freeze_support()
     main()
-    
\ No newline at end of file
@@ -0,0 +1,280 @@
+import math
+import numpy
+from fractions import Fraction
+from constants import *
+
+COLLISION_STEP = 1 / 30.0
+MAX_HORIZON = 120.0
+MAX_SAMPLES = 20000
+BATCH_SIZE = 4000000
+WINDOW_SAMPLES = 32 # samples covered by one box of the broad phase
+
+PLAYBACK_FPS = 30
+MAX_FRAMES = 3600
+
+BODIES = [
+    ('asteroids', 'Asteroid', RADIUS_ASTEROID, True),
+    ('bumpers', 'Bumper', RADIUS_BUMPER, True),
+    ('items', 'Item', RADIUS_ITEM, False),
+    ('planets', 'Planet', RADIUS_PLANET, True),
+    ('rockets', 'Rocket', RADIUS_ROCKET, False),
+    ('stars', 'Star', RADIUS_STAR, False),
+    ('teleports', 'Teleport', RADIUS_TELEPORT, False),
+]
+
+def level_key(level):
+    return getattr(level, 'key', level)
+
+class Motion(object):
+    def __init__(self, keys):
+        count = len(keys)
+        self.count = count
+        self.x = numpy.zeros(count)
+        self.y = numpy.zeros(count)
+        self.cx = numpy.zeros(count)
+        self.cy = numpy.zeros(count)
+        self.ax = numpy.zeros(count)
+        self.ay = numpy.zeros(count)
+        self.px = numpy.zeros(count)
+        self.py = numpy.zeros(count)
+        self.omega = numpy.zeros(count)
+        self.period = numpy.zeros(count)
+        self.circular = numpy.zeros(count, dtype=bool)
+        for index, key in enumerate(keys):
+            x = key.get('x', 0)
+            y = key.get('y', 0)
+            self.x[index] = self.cx[index] = x
+            self.y[index] = self.cy[index] = y
+            path = key.get('path', None)
+            if not path or path.get('period', 0) <= 0:
+                continue
+            period = float(path['period'])
+            cx, cy = path['x'], path['y']
+            omega = 2 * math.pi / period
+            if path['type'] == PATH_CIRCULAR:
+                if path.get('clockwise', False):
+                    omega = -omega
+                radius = math.hypot(x - cx, y - cy)
+                phase = math.atan2(y - cy, x - cx)
+                self.ax[index] = self.ay[index] = radius
+                self.px[index] = phase
+                self.py[index] = phase - math.pi / 2
+                self.circular[index] = True
+            elif path['type'] == PATH_LINEAR:
+                self.ax[index] = x - cx
+                self.ay[index] = y - cy
+            else:
+                continue
+            self.cx[index] = cx
+            self.cy[index] = cy
+            self.omega[index] = omega
+            self.period[index] = period
+        self.moving = self.omega != 0
+    def __len__(self):
+        return self.count
+    def positions(self, t):
+        t = numpy.asarray(t, dtype=float)[..., numpy.newaxis]
+        angle = self.omega * t
+        x = self.cx + self.ax * numpy.cos(angle + self.px)
+        y = self.cy + self.ay * numpy.cos(angle + self.py)
+        return x, y
+    def track(self, indices, t):
+        return self.at(indices, numpy.asarray(t, dtype=float)[..., numpy.newaxis])
+    def at(self, indices, t):
+        # positions of indices at times t, broadcast against each other
+        angle = self.omega[indices] * t
+        x = self.cx[indices] + self.ax[indices] * numpy.cos(angle + self.px[indices])
+        y = self.cy[indices] + self.ay[indices] * numpy.cos(angle + self.py[indices])
+        return x, y
+
+# Collision Analysis
+def gcd(a, b):
+    while b:
+        a, b = b, a % b
+    return a
+
+def common_period(periods, limit=MAX_HORIZON):
+    result = None
+    for period in periods:
+        value = Fraction(period).limit_denominator(1000)
+        if result is None:
+            result = value
+        else:
+            a, b = result.numerator, value.numerator
+            numerator = a * b // gcd(a, b)
+            result = Fraction(numerator, gcd(result.denominator, value.denominator))
+        if result > limit:
+            return float(limit), True
+    return float(result or 0), False
+
+class Bodies(object):
+    def __init__(self, level):
+        key = level_key(level)
+        entities = key.get('entities', {})
+        self.refs = []
+        self.names = []
+        keys, radius, solid = [], [], []
+        for kind, name, base, scaled in BODIES:
+            for index, entity in enumerate(entities.get(kind, [])):
+                self.refs.append((kind, index))
+                self.names.append('%s %d' % (name, index + 1))
+                keys.append(entity)
+                radius.append(base * entity.get('scale', DEFAULT_SCALE) if scaled else base)
+                solid.append(scaled)
+        self.motion = Motion(keys)
+        self.radius = numpy.array(radius, dtype=float)
+        self.solid = numpy.array(solid, dtype=bool)
+
+class Collision(object):
+    def __init__(self, a, b, intervals, static=False):
+        self.a = a
+        self.b = b
+        self.intervals = intervals
+        self.static = static
+    def describe(self, names):
+        spans = ', '.join('%.2f-%.2fs' % span for span in self.intervals[:3])
+        if len(self.intervals) > 3:
+            spans += ', ...'
+        verb = 'sweeps over' if self.static else 'collides with'
+        return '%s %s %s at %s' % (names[self.a], verb, names[self.b], spans)
+
+class Report(object):
+    def __init__(self, bodies, period=0.0, truncated=False, collisions=()):
+        self.refs = bodies.refs
+        self.names = bodies.names
+        self.period = period
+        self.truncated = truncated
+        self.collisions = list(collisions)
+    def messages(self):
+        return [collision.describe(self.names) for collision in self.collisions]
+
+def overlapping(first, second, same=False):
+    # pairs of boxes (l, b, r, t) that overlap, by sweeping the first set
+    # over the second sorted by left edge; with same, the sets are one and
+    # each pair is listed once
+    l1, b1, r1, t1 = first
+    l2, b2, r2, t2 = second
+    empty = numpy.zeros(0, dtype=int)
+    if not len(l1) or not len(l2):
+        return empty, empty
+    order = numpy.argsort(l2, kind='mergesort')
+    left = l2[order]
+    lo = numpy.searchsorted(left, l1 - (r2 - l2).max(), 'right')
+    hi = numpy.searchsorted(left, r1, 'left')
+    counts = numpy.maximum(hi - lo, 0)
+    rows = numpy.repeat(numpy.arange(len(l1)), counts)
+    offsets = numpy.arange(counts.sum()) - numpy.repeat(numpy.cumsum(counts) - counts, counts)
+    columns = order[numpy.repeat(lo, counts) + offsets]
+    keep = (l2[columns] < r1[rows]) & (l1[rows] < r2[columns]) & (b1[rows] < t2[columns]) & (b2[columns] < t1[rows])
+    if same:
+        keep &= rows < columns
+    return rows[keep], columns[keep]
+
+def spans(hit):
+    # runs of True down each column of hit, as columns, starts and ends
+    count = hit.shape[0]
+    padded = numpy.zeros((hit.shape[1], count + 2), dtype=numpy.int8)
+    padded[:, 1:-1] = hit.T
+    change = numpy.diff(padded, axis=1)
+    columns, starts = numpy.nonzero(change == 1)
+    dummy, ends = numpy.nonzero(change == -1)
+    return columns, starts, ends
+
+def candidates(bodies, times):
+    # pairs that may touch, each with a window of WINDOW_SAMPLES samples in
+    # which their boxes overlap; moving bodies get a box per window, so
+    # bodies sharing an orbit only pair up where they pass each other
+    motion = bodies.motion
+    radius, solid = bodies.radius, bodies.solid
+    moving = numpy.nonzero(motion.moving)[0]
+    static = numpy.nonzero(~motion.moving)[0]
+    fixed = (
+        motion.x[static] - radius[static], motion.y[static] - radius[static],
+        motion.x[static] + radius[static], motion.y[static] + radius[static],
+    )
+    windows, firsts, seconds = [], [], []
+    for window, begin in enumerate(range(0, len(times), WINDOW_SAMPLES)):
+        xs, ys = motion.track(moving, times[begin:begin + WINDOW_SAMPLES])
+        boxes = (
+            xs.min(axis=0) - radius[moving], ys.min(axis=0) - radius[moving],
+            xs.max(axis=0) + radius[moving], ys.max(axis=0) + radius[moving],
+        )
+        rows, columns = overlapping(boxes, boxes, True)
+        a, b = moving[rows], moving[columns]
+        rows, columns = overlapping(boxes, fixed)
+        a = numpy.concatenate([a, moving[rows]])
+        b = numpy.concatenate([b, static[columns]])
+        keep = solid[a] | solid[b]
+        windows.append(numpy.repeat(window, keep.sum()))
+        firsts.append(a[keep])
+        seconds.append(b[keep])
+    return numpy.concatenate(windows), numpy.concatenate(firsts), numpy.concatenate(seconds)
+
+def collisions(level, step=COLLISION_STEP):
+    bodies = Bodies(level)
+    motion = bodies.motion
+    moving = numpy.nonzero(motion.moving)[0]
+    if not len(moving):
+        return Report(bodies)
+    period, truncated = common_period(motion.period[moving])
+    reach = numpy.abs(motion.omega[moving]) * numpy.maximum(numpy.abs(motion.ax[moving]), numpy.abs(motion.ay[moving]))
+    step = min(step, bodies.radius[moving].min() / (2 * reach.max()))
+    step = max(step, period / MAX_SAMPLES)
+    times = numpy.arange(0, period, step)
+    windows, a, b = candidates(bodies, times)
+    # moving pairs come first, then each pair's windows in order
+    order = numpy.lexsort((windows, b, a, ~motion.moving[b]))
+    windows, a, b = windows[order], a[order], b[order]
+    offsets = numpy.arange(WINDOW_SAMPLES)
+    firsts, seconds, starts, ends = [], [], [], []
+    batch = max(1, BATCH_SIZE // WINDOW_SAMPLES)
+    for offset in range(0, len(a), batch):
+        chunk = slice(offset, offset + batch)
+        samples = windows[chunk] * WINDOW_SAMPLES + offsets[:, numpy.newaxis]
+        valid = samples < len(times)
+        t = times[numpy.minimum(samples, len(times) - 1)]
+        xa, ya = motion.at(a[chunk], t)
+        xb, yb = motion.at(b[chunk], t)
+        dx, dy = xa - xb, ya - yb
+        limit = bodies.radius[a[chunk]] + bodies.radius[b[chunk]]
+        hit = (dx * dx + dy * dy < limit * limit) & valid
+        columns, first, last = spans(hit)
+        base = windows[chunk][columns] * WINDOW_SAMPLES
+        firsts.append(a[chunk][columns])
+        seconds.append(b[chunk][columns])
+        starts.append(base + first)
+        ends.append(base + last)
+    result = []
+    def add(pair, runs):
+        intervals = [(float(times[start]), float(times[end - 1] + step)) for start, end in runs]
+        result.append(Collision(pair[0], pair[1], intervals, not motion.moving[pair[1]]))
+    pair, runs = None, []
+    rows = zip(*[numpy.concatenate(values).tolist() for values in (firsts, seconds, starts, ends)]) if firsts else []
+    for i, j, start, end in rows:
+        if (i, j) != pair:
+            if runs:
+                add(pair, runs)
+            pair, runs = (i, j), []
+        # runs that meet at the edge of a window are one run
+        if runs and runs[-1][1] == start:
+            runs[-1][1] = end
+        else:
+            runs.append([start, end])
+    if runs:
+        add(pair, runs)
+    return Report(bodies, period, truncated, result)
+
+# Playback
+class Playback(object):
+    def __init__(self, keys, fps=PLAYBACK_FPS):
+        self.motion = Motion(keys)
+        self.period, truncated = common_period(self.motion.period[self.motion.moving], MAX_FRAMES / float(fps))
+        self.count = 0 if truncated else int(math.ceil(self.period * fps))
+        if self.count:
+            times = numpy.arange(self.count) * self.period / self.count
+            self.xs, self.ys = self.motion.positions(times)
+    def positions(self, t):
+        if self.count:
+            frame = int(t / self.period * self.count) % self.count
+            return self.xs[frame], self.ys[frame]
+        return self.motion.positions(t)
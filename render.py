@@ -0,0 +1,691 @@
+import argparse
+import base64
+import glob
+import io
+import json
+import math
+import multiprocessing
+import os
+import sys
+import tempfile
+import threading
+import time
+import traceback
+import hashing
+from constants import *
+from store import FILE_MODE, load_keys, replace
+
+try:
+    from PIL import Image, ImageDraw
+except ImportError:
+    import Image
+    import ImageDraw
+
+THUMBNAIL_SIZE = 300
+RENDER_VERSION = 3 # bump when output changes so exports are redone
+MANIFEST_NAME = 'thumbs.json'
+CACHE_NAME = 'thumbnails'
+ATLAS_NAME = 'atlas' # name.json must not be the folder export's MANIFEST_NAME
+ATLAS_PAGE_SIZE = 2048
+ATLAS_PADDING = 2
+CACHE_LIMIT = 64 * 1024 * 1024 # bytes
+SPRITE_CACHE_SIZE = 256
+TILE_QUANTUM = 1000
+MAX_SUPERSAMPLE = 4
+MINIMAP_PATCH_LIMIT = 64 # changed entities before a full redraw
+DOT_PATTERN = (1, 2) # pixels on, pixels off
+BACKGROUND = (0, 0, 0)
+PATH_COLOR = (255, 255, 255)
+
+RESAMPLE = getattr(Image, 'LANCZOS', None) or Image.ANTIALIAS
+
+IMAGES = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'images')
+
+SCALED = set(['asteroids', 'bumpers', 'planets'])
+
+def sprite_name(group, key):
+    if group == 'planets':
+        return 'planet%d' % (key.get('sprite', 0) + 1)
+    if group == 'items':
+        return ['item_zipper', 'item_magnet', 'item_shield'][key.get('type', 0)]
+    return {
+        'asteroids': 'asteroid',
+        'bumpers': 'bumper',
+        'rockets': 'rocket',
+        'stars': 'coin',
+        'teleports': 'teleport',
+    }[group]
+
+SPRITES = {}
+
+def load_sprite(name):
+    sprite = SPRITES.get(name)
+    if sprite is None:
+        path = os.path.join(IMAGES, name + '.png')
+        if os.path.exists(path):
+            sprite = Image.open(path)
+        else:
+            # frozen builds only carry the embedded copies
+            import icons
+            data = base64.b64decode(getattr(icons, name).data)
+            sprite = Image.open(io.BytesIO(data))
+        sprite = sprite.convert('RGBA')
+        SPRITES[name] = sprite
+    return sprite
+
+TILES = {}
+TILE_ORDER = []
+TILE_LOCK = threading.Lock() # thumbnails render on worker threads
+
+def scaled_sprite(name, factor):
+    # factors are quantized so nearby zooms and entity scales share tiles
+    key = (name, int(round(factor * TILE_QUANTUM)))
+    tile = TILES.get(key)
+    if tile is None:
+        sprite = load_sprite(name)
+        w, h = sprite.size
+        factor = float(key[1]) / TILE_QUANTUM
+        size = (max(int(w * factor), 1), max(int(h * factor), 1))
+        tile = sprite.resize(size, RESAMPLE)
+        with TILE_LOCK:
+            TILES[key] = tile
+            TILE_ORDER.append(key)
+            while len(TILE_ORDER) > SPRITE_CACHE_SIZE:
+                TILES.pop(TILE_ORDER.pop(0), None)
+    return tile
+
+def pixel(value):
+    # rounds half up, so results shift exactly with the canvas origin
+    return int(math.floor(value + 0.5))
+
+def full_size(bounds, square=True):
+    l, b, r, t = bounds
+    w, h = int(r - l), int(t - b)
+    if square:
+        w, h = max(w, h), max(w, h)
+    return w, h
+
+class Canvas(object):
+    # origin offsets drawing onto an image of just one region of size
+    def __init__(self, bounds, scale, size, image=None, origin=(0, 0)):
+        self.bounds = bounds
+        self.scale = scale
+        self.size = size
+        self.origin = origin
+        self.image = image or Image.new('RGB', size, BACKGROUND)
+        self.draw = ImageDraw.Draw(self.image)
+        self.color = 255 if self.image.mode == 'L' else PATH_COLOR
+    def frame(self, x, y):
+        s = self.scale
+        w, h = self.size
+        l, b, r, t = self.bounds
+        # same arithmetic as Control.cc2wx so sprites land on the same pixels
+        x = (w - (r - l) * s) / 2 + s * (x - l)
+        y = (h - (t - b) * s) / 2 + s * (t - y)
+        return x, y
+    def cc2wx(self, x, y):
+        x, y = self.frame(x, y)
+        return x - self.origin[0], y - self.origin[1]
+    def wx2cc(self, x, y):
+        s = float(self.scale)
+        w, h = self.size
+        l, b, r, t = self.bounds
+        x = l + (x + self.origin[0] - (w - (r - l) * s) / 2) / s
+        y = t - (y + self.origin[1] - (h - (t - b) * s) / 2) / s
+        return x, y
+    def points(self, points):
+        # rounded in frame pixels before the origin is taken off, so a
+        # region draws exactly what the whole frame would
+        ox, oy = self.origin
+        return [(pixel(x) - ox, pixel(y) - oy) for x, y in points]
+    def dots(self, count):
+        # indices of the lit pixels along a path of count pixels
+        on, off = DOT_PATTERN
+        period = on + off
+        return [index for start in range(0, count, period) for index in range(start, min(start + on, count))]
+    def circle(self, x, y, radius):
+        x, y = self.frame(x, y)
+        x, y, radius = math.floor(x), math.floor(y), int(radius * self.scale)
+        count = max(int(2 * math.pi * radius), 8)
+        step = 2 * math.pi / count
+        cos, sin = math.cos, math.sin
+        points = [(x + cos(index * step) * radius, y + sin(index * step) * radius) for index in self.dots(count)]
+        self.draw.point(self.points(points), fill=self.color)
+    def line(self, x1, y1, x2, y2):
+        x1, y1 = self.frame(x1, y1)
+        x2, y2 = self.frame(x2, y2)
+        count = max(int(math.hypot(x2 - x1, y2 - y1)), 1)
+        dx, dy = (x2 - x1) / float(count), (y2 - y1) / float(count)
+        points = [(x1 + dx * index, y1 + dy * index) for index in self.dots(count + 1)]
+        self.draw.point(self.points(points), fill=self.color)
+    def sprite(self, name, factor, x, y):
+        tile = scaled_sprite(name, factor)
+        w, h = tile.size
+        x, y = self.frame(x, y)
+        self.image.paste(tile, self.points([(x - w / 2.0, y - h / 2.0)])[0], tile)
+
+def entity_items(key):
+    entities = key.get('entities', {})
+    for group in sorted(entities):
+        for entity in entities[group]:
+            yield group, entity
+
+def draw_paths(canvas, key):
+    drawn = set()
+    for group, entity in entity_items(key):
+        path = entity.get('path', None)
+        if not path:
+            continue
+        x, y = entity.get('x', 0), entity.get('y', 0)
+        dx, dy = x - path['x'], y - path['y']
+        if path['type'] == PATH_CIRCULAR:
+            radius = math.hypot(dx, dy)
+            circle = (int(path['x']), int(path['y']), int(radius))
+            if circle not in drawn:
+                # drawn from the rounded key, so it does not matter which
+                # of the entities sharing it comes first
+                drawn.add(circle)
+                canvas.circle(*circle)
+        elif path['type'] == PATH_LINEAR:
+            canvas.line(x, y, x - dx * 2, y - dy * 2)
+
+def sprite_factor(scale, group, entity):
+    factor = scale / 2.0
+    if group in SCALED:
+        factor *= entity.get('scale', DEFAULT_SCALE)
+    return factor
+
+def draw_entities(canvas, key):
+    for group, entity in entity_items(key):
+        factor = sprite_factor(canvas.scale, group, entity)
+        canvas.sprite(sprite_name(group, entity), factor, entity.get('x', 0), entity.get('y', 0))
+
+def has_paths(key):
+    return any(entity.get('path', None) for group, entity in entity_items(key))
+
+def render_full(level, scale=1, size=THUMBNAIL_SIZE):
+    # draws at the level's own resolution and downscales; kept for
+    # unscaled renders and as the reference for the direct path
+    key = getattr(level, 'key', level)
+    bounds = tuple(key.get('bounds', DEFAULT_BOUNDS))
+    canvas = Canvas(bounds, scale, full_size(bounds, bool(size)))
+    draw_paths(canvas, key)
+    draw_entities(canvas, key)
+    image = canvas.image
+    if size:
+        image = image.resize((size, size), RESAMPLE)
+    return image.convert('RGBA')
+
+def render(level, scale=1, size=THUMBNAIL_SIZE, supersample=None):
+    # draws straight at the target size with pre-scaled sprites; only the
+    # one pixel dotted paths are supersampled, on a single channel layer
+    if not size:
+        return render_full(level, scale, size)
+    key = getattr(level, 'key', level)
+    bounds = tuple(key.get('bounds', DEFAULT_BOUNDS))
+    full = max(full_size(bounds)[0], 1)
+    s = scale * float(size) / full
+    if supersample is None:
+        supersample = min(max(int(math.ceil(float(full) / size)), 1), MAX_SUPERSAMPLE)
+    base = None
+    if has_paths(key):
+        large = size * supersample
+        paths = Canvas(bounds, s * supersample, (large, large), Image.new('L', (large, large), 0))
+        draw_paths(paths, key)
+        base = paths.image
+        if supersample > 1:
+            base = base.resize((size, size), RESAMPLE)
+        base = Image.merge('RGB', (base, base, base))
+    canvas = Canvas(bounds, s, (size, size), base)
+    draw_entities(canvas, key)
+    return canvas.image.convert('RGBA')
+
+def render_array(level, scale=1, size=THUMBNAIL_SIZE):
+    import numpy
+    return numpy.asarray(render(level, scale, size))
+
+def write_atomic(path, write, mode='wb'):
+    # written to a temporary file first so an interrupted write never
+    # leaves a truncated file behind
+    handle, temp = tempfile.mkstemp(suffix='.tmp', dir=os.path.dirname(os.path.abspath(path)))
+    try:
+        with os.fdopen(handle, mode) as file:
+            write(file)
+        os.chmod(temp, FILE_MODE)
+        replace(temp, path)
+    finally:
+        if os.path.exists(temp):
+            os.remove(temp)
+
+def save_image(image, path):
+    write_atomic(path, lambda file: image.save(file, 'PNG'))
+
+def copy_file(source, path):
+    with open(source, 'rb') as file:
+        data = file.read()
+    write_atomic(path, lambda file: file.write(data))
+
+def save_thumbnail(level, path, scale=1, size=THUMBNAIL_SIZE):
+    save_image(render(level, scale, size), path)
+
+def thumbnail_digest(level_hash, scale=1, size=THUMBNAIL_SIZE):
+    return hashing.digest([RENDER_VERSION, level_hash, scale, size])
+
+class Manifest(object):
+    # digests of the thumbnails in an output directory, so unchanged
+    # levels are skipped by later exports
+    def __init__(self, folder):
+        self.path = os.path.join(folder, MANIFEST_NAME)
+        self.digests = {}
+        try:
+            with open(self.path, 'r') as file:
+                self.digests = json.loads(file.read())
+        except Exception:
+            pass
+    def needed(self, name, digest):
+        path = os.path.join(os.path.dirname(self.path), name)
+        return self.digests.get(name) != digest or not os.path.exists(path)
+    def update(self, name, digest):
+        self.digests[name] = digest
+    def save(self):
+        data = json.dumps(self.digests, sort_keys=True, indent=1)
+        write_atomic(self.path, lambda file: file.write(data), 'w')
+
+# Minimap
+class Snapshot(object):
+    # a small render of a level that is patched where entities changed;
+    # large edits and new bounds fall back to a full render
+    def __init__(self, size):
+        self.size = size
+        self.bounds = None
+        self.canvas = None
+        self.entries = {}
+    @property
+    def image(self):
+        return self.canvas.image if self.canvas else None
+    def entity_rect(self, group, entity):
+        canvas = self.canvas
+        x, y = canvas.cc2wx(entity.get('x', 0), entity.get('y', 0))
+        w, h = scaled_sprite(sprite_name(group, entity), sprite_factor(canvas.scale, group, entity)).size
+        l, t, r, b = x - w / 2.0, y - h / 2.0, x + w / 2.0, y + h / 2.0
+        path = entity.get('path', None)
+        if path:
+            px, py = canvas.cc2wx(path['x'], path['y'])
+            if path['type'] == PATH_CIRCULAR:
+                radius = math.hypot(px - x, py - y)
+                l, t, r, b = min(l, px - radius), min(t, py - radius), max(r, px + radius), max(b, py + radius)
+            else:
+                ex, ey = 2 * px - x, 2 * py - y # far end of the dotted line
+                l, t, r, b = min(l, ex), min(t, ey), max(r, ex), max(b, ey)
+        return (int(math.floor(l)) - 1, int(math.floor(t)) - 1, int(math.ceil(r)) + 1, int(math.ceil(b)) + 1)
+    def update(self, key, digests=None):
+        # digests are the entity hashes in entity_items order, if known;
+        # returns the changed (l, t, r, b) pixel region or None
+        items = list(entity_items(key))
+        if digests is None:
+            digests = [hashing.digest(entity) for group, entity in items]
+        # entity hashes leave out the group, which decides the sprite
+        digests = [(group, digest) for (group, entity), digest in zip(items, digests)]
+        bounds = tuple(key.get('bounds', DEFAULT_BOUNDS))
+        if bounds != self.bounds:
+            self.bounds = bounds
+            w, h = full_size(bounds, False)
+            scale = float(self.size) / max(w, h, 1)
+            size = (max(int(w * scale), 1), max(int(h * scale), 1))
+            self.canvas = Canvas(bounds, scale, size)
+            self.entries = {}
+            return self.redraw(items, digests, None)
+        old = self.entries
+        counts = {}
+        for digest in digests:
+            counts[digest] = counts.get(digest, 0) + 1
+        changed = [digest for digest in set(counts) | set(old) if counts.get(digest) != (old[digest][0] if digest in old else None)]
+        if not changed:
+            return None
+        if len(changed) > MINIMAP_PATCH_LIMIT:
+            return self.redraw(items, digests, None)
+        rects = [old[digest][1] for digest in changed if digest in old]
+        for (group, entity), digest in zip(items, digests):
+            if digest in changed and digest in counts:
+                rects.append(self.entity_rect(group, entity))
+                changed.remove(digest)
+        w, h = self.canvas.size
+        region = (max(min(r[0] for r in rects), 0), max(min(r[1] for r in rects), 0),
+            min(max(r[2] for r in rects), w), min(max(r[3] for r in rects), h))
+        if (region[2] - region[0]) * (region[3] - region[1]) * 2 > w * h:
+            region = None
+        return self.redraw(items, digests, region)
+    def redraw(self, items, digests, region):
+        entries = {}
+        old = self.entries
+        for (group, entity), digest in zip(items, digests):
+            if digest in entries:
+                entries[digest][0] += 1
+            else:
+                rect = old[digest][1] if digest in old else self.entity_rect(group, entity)
+                entries[digest] = [1, rect, group, entity]
+        self.entries = entries
+        w, h = self.canvas.size
+        if region is None:
+            region = (0, 0, w, h)
+            subset = items
+        else:
+            l, t, r, b = region
+            if r <= l or b <= t:
+                return None
+            subset = [(group, entity) for (group, entity), digest in zip(items, digests)
+                if self.overlaps(entries[digest][1], region)]
+        l, t, r, b = region
+        canvas = Canvas(self.bounds, self.canvas.scale, (w, h), Image.new('RGB', (r - l, b - t), BACKGROUND), (l, t))
+        groups = {}
+        for group, entity in subset:
+            groups.setdefault(group, []).append(entity)
+        draw_paths(canvas, {'entities': groups})
+        draw_entities(canvas, {'entities': groups})
+        self.canvas.image.paste(canvas.image, (l, t))
+        return region
+    @staticmethod
+    def overlaps(a, b):
+        return a[0] < b[2] and b[0] < a[2] and a[1] < b[3] and b[1] < a[3]
+
+# Cache
+def cache_root():
+    base = os.environ.get('LOCALAPPDATA') or os.environ.get('XDG_CACHE_HOME')
+    base = base or os.path.join(os.path.expanduser('~'), '.cache')
+    return os.path.join(base, 'StarEdit', CACHE_NAME)
+
+class Cache(object):
+    # rendered thumbnails by digest; reads refresh the file time so the
+    # least recently used entries are evicted first
+    def __init__(self, root=None, limit=CACHE_LIMIT):
+        self.root = root or cache_root()
+        self.limit = limit
+        self.entries = None
+        self.total = 0
+        self.lock = threading.RLock()
+    def path(self, digest):
+        return os.path.join(self.root, digest[:2], digest + '.png')
+    def scan(self):
+        if self.entries is None:
+            self.entries = {}
+            for folder, names, files in os.walk(self.root):
+                for name in files:
+                    if name.endswith('.png'):
+                        try:
+                            stat = os.stat(os.path.join(folder, name))
+                        except OSError:
+                            continue
+                        self.entries[os.path.join(folder, name)] = (stat.st_mtime, stat.st_size)
+            self.total = sum(size for mtime, size in self.entries.values())
+        return self.entries
+    def touch(self, path):
+        with self.lock:
+            now = time.time()
+            os.utime(path, (now, now))
+            size = os.path.getsize(path)
+            if self.entries is not None:
+                self.total += size - self.entries.get(path, (0, 0))[1]
+                self.entries[path] = (now, size)
+    def get(self, digest):
+        path = self.path(digest)
+        try:
+            self.touch(path)
+        except OSError:
+            return None
+        return path
+    def add(self, digest, write):
+        path = self.path(digest)
+        folder = os.path.dirname(path)
+        if not os.path.isdir(folder):
+            try:
+                os.makedirs(folder)
+            except OSError:
+                pass # created by another process
+        write_atomic(path, write)
+        with self.lock:
+            self.scan()
+            self.touch(path)
+            self.trim()
+        return path
+    def put(self, digest, image):
+        return self.add(digest, lambda file: image.save(file, 'PNG'))
+    def put_file(self, digest, source):
+        with open(source, 'rb') as file:
+            data = file.read()
+        return self.add(digest, lambda file: file.write(data))
+    def trim(self):
+        entries = self.scan()
+        if self.total <= self.limit:
+            return
+        for path in sorted(entries, key=lambda path: entries[path][0]):
+            if self.total <= self.limit:
+                break
+            self.total -= entries.pop(path)[1]
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+    def image(self, level, scale=1, size=THUMBNAIL_SIZE, level_hash=None):
+        level_hash = level_hash or getattr(level, 'hash', None) or hashing.level_hash(level)
+        digest = thumbnail_digest(level_hash, scale, size)
+        path = self.get(digest)
+        if path:
+            try:
+                image = Image.open(path)
+                image.load()
+                return image.convert('RGBA')
+            except IOError:
+                pass # damaged entry, render it again
+        image = render(level, scale, size)
+        try:
+            self.put(digest, image)
+        except (IOError, OSError):
+            traceback.print_exc()
+        return image
+
+CACHES = {}
+CACHE_LOCK = threading.Lock()
+
+def get_cache(root=None):
+    root = root or cache_root()
+    with CACHE_LOCK:
+        if root not in CACHES:
+            CACHES[root] = Cache(root)
+        return CACHES[root]
+
+# Export
+def resolution_name(name, factor):
+    if factor == 1:
+        return name
+    base, ext = os.path.splitext(name)
+    return '%s@%dx%s' % (base, factor, ext)
+
+def save_images(image, outputs):
+    # outputs are (path, size), largest first; each smaller size is
+    # downsampled from the full render while the previous one is encoded
+    threads = []
+    for path, size in outputs:
+        if image.size != (size, size):
+            image = image.resize((size, size), RESAMPLE)
+        thread = threading.Thread(target=save_image, args=(image, path))
+        thread.start()
+        threads.append(thread)
+    for thread in threads:
+        thread.join()
+
+def export_job(job):
+    index, (key, outputs, scale, root) = job
+    path, size = outputs[0]
+    cache = get_cache(root) if root else None
+    digest = thumbnail_digest(hashing.level_hash(key), scale, size)
+    source = cache.get(digest) if cache else None
+    if source:
+        try:
+            copy_file(source, path)
+            if len(outputs) > 1:
+                save_images(Image.open(path), outputs[1:])
+            return index
+        except (IOError, OSError):
+            pass # evicted meanwhile
+    save_images(render(key, scale, size), outputs)
+    if cache:
+        try:
+            cache.put_file(digest, path)
+        except (IOError, OSError):
+            traceback.print_exc()
+    return index
+
+def export_thumbnails(jobs, processes=None, callback=None):
+    # jobs are (key, outputs, scale, cache root); callback(index) may return False to cancel
+    pool = multiprocessing.Pool(processes)
+    try:
+        count = 0
+        for index in pool.imap_unordered(export_job, enumerate(jobs)):
+            count += 1
+            if callback and callback(index) is False:
+                pool.terminate()
+                break
+        return count
+    finally:
+        pool.close()
+        pool.join()
+
+def export_folder(keys, folder, start=1, scale=1, size=THUMBNAIL_SIZE, processes=None, callback=None, cache=None,
+        resolutions=(1,)):
+    # each level is rendered once at the largest resolution; thumbN@2x.png
+    # and so on are named after their factor of size
+    manifest = Manifest(folder)
+    factors = sorted(set(resolutions), reverse=True)
+    jobs = []
+    digests = []
+    for index, key in enumerate(keys):
+        name = 'thumb%d.png' % (index + start)
+        names = [resolution_name(name, factor) for factor in factors]
+        digest = thumbnail_digest(hashing.level_hash(key), scale, size * factors[0])
+        if any(manifest.needed(name, digest) for name in names):
+            outputs = [(os.path.join(folder, name), size * factor) for name, factor in zip(names, factors)]
+            jobs.append((key, outputs, scale, cache))
+            digests.append([(name, digest) for name in names])
+    def report(index):
+        for name, digest in digests[index]:
+            manifest.update(name, digest)
+        if callback:
+            return callback(index, len(jobs))
+    try:
+        if jobs:
+            export_thumbnails(jobs, processes, report)
+    finally:
+        manifest.save()
+    return len(jobs)
+
+def parse_resolutions(text):
+    # '1,2,4' or '1x 2x 4x'
+    factors = [int(part.strip().rstrip('xX')) for part in text.replace(',', ' ').split()]
+    if not factors or min(factors) < 1:
+        raise ValueError('Invalid resolutions: %s' % text)
+    return factors
+
+# Atlas
+def atlas_job(job):
+    index, (key, scale, size, root) = job
+    if root is None:
+        image = render(key, scale, size)
+    else:
+        image = get_cache(root).image(key, scale, size)
+    return index, image.mode, image.size, image.tobytes()
+
+def atlas_layout(count, size, page_size, padding):
+    # fixed grid cells; the last page is cropped to the cells it uses
+    cell = size + padding
+    columns = (page_size - padding) // cell
+    if columns < 1:
+        raise ValueError('Page size %d is too small for %dpx thumbnails' % (page_size, size))
+    per_page = columns * columns
+    rects = []
+    pages = []
+    for index in range(count):
+        page, slot = divmod(index, per_page)
+        row, column = divmod(slot, columns)
+        rects.append((page, padding + column * cell, padding + row * cell, size, size))
+        used = min(count - page * per_page, per_page)
+        if page == len(pages):
+            width = padding + min(used, columns) * cell
+            height = padding + ((used + columns - 1) // columns) * cell
+            pages.append((width, height))
+    return pages, rects
+
+def export_atlas(keys, folder, name=ATLAS_NAME, start=1, page_size=ATLAS_PAGE_SIZE, padding=ATLAS_PADDING,
+        scale=1, size=THUMBNAIL_SIZE, processes=None, callback=None, cache=None):
+    # renders every thumbnail in one pass and packs them into pages
+    # described by name.json; returns the number of thumbnails rendered
+    if name + '.json' == MANIFEST_NAME:
+        raise ValueError('atlas index would overwrite the thumbnail manifest: %s' % MANIFEST_NAME)
+    index_path = os.path.join(folder, name + '.json')
+    page_sizes, rects = atlas_layout(len(keys), size, page_size, padding)
+    digests = [thumbnail_digest(hashing.level_hash(key), scale, size) for key in keys]
+    digest = hashing.digest([digests, page_size, padding, start])
+    page_names = ['%s%d.png' % (name, page) for page in range(len(page_sizes))]
+    try:
+        with open(index_path, 'r') as file:
+            old = json.loads(file.read())
+        if old.get('digest') == digest and all(os.path.exists(os.path.join(folder, page)) for page in page_names):
+            return 0
+    except Exception:
+        pass
+    pages = [Image.new('RGBA', page, (0, 0, 0, 0)) for page in page_sizes]
+    jobs = [(key, scale, size, cache) for key in keys]
+    pool = multiprocessing.Pool(processes)
+    try:
+        for count, (index, mode, image_size, data) in enumerate(pool.imap_unordered(atlas_job, enumerate(jobs))):
+            page, x, y, w, h = rects[index]
+            pages[page].paste(Image.frombytes(mode, image_size, data), (x, y))
+            if callback and callback(index, len(jobs)) is False:
+                pool.terminate()
+                return count + 1
+    finally:
+        pool.close()
+        pool.join()
+    for page, page_name in zip(pages, page_names):
+        save_image(page, os.path.join(folder, page_name))
+    levels = []
+    for index, (page, x, y, w, h) in enumerate(rects):
+        levels.append({'level': index + start, 'page': page, 'x': x, 'y': y, 'w': w, 'h': h})
+    data = json.dumps({'digest': digest, 'pages': page_names, 'levels': levels}, indent=1)
+    write_atomic(index_path, lambda file: file.write(data), 'w')
+    return len(jobs)
+
+# Command Line
+def main(args=None):
+    parser = argparse.ArgumentParser(description='Render Star Rocket level thumbnails.')
+    parser.add_argument('paths', nargs='+', help='.star files (wildcards allowed)')
+    parser.add_argument('-o', '--output', required=True, help='directory for the thumbnails')
+    parser.add_argument('-s', '--size', type=int, default=THUMBNAIL_SIZE, help='thumbnail size in pixels')
+    parser.add_argument('-n', '--start', type=int, default=1, help='number of the first thumbnail')
+    parser.add_argument('-p', '--processes', type=int, default=None)
+    parser.add_argument('-c', '--cache', default=None, help='thumbnail cache directory to reuse renders from')
+    parser.add_argument('-r', '--resolutions', type=parse_resolutions, default=[1],
+        help='comma separated scale factors of the size, e.g. 1,2,4')
+    parser.add_argument('-a', '--atlas', type=int, default=None, metavar='PAGE_SIZE',
+        help='pack the thumbnails into atlas pages of this size instead of separate files')
+    parser.add_argument('--atlas-name', default=ATLAS_NAME, help='base name of the atlas pages and index')
+    args = parser.parse_args(args)
+    paths = []
+    for pattern in args.paths:
+        paths.extend(sorted(glob.glob(pattern)) or [pattern])
+    if not os.path.isdir(args.output):
+        os.makedirs(args.output)
+    keys = []
+    for path in paths:
+        keys.extend(load_keys(path))
+    if args.atlas:
+        count = export_atlas(keys, args.output, args.atlas_name, start=args.start, page_size=args.atlas, size=args.size,
+            processes=args.processes, cache=args.cache)
+    else:
+        count = export_folder(keys, args.output, args.start, size=args.size, processes=args.processes,
+            cache=args.cache, resolutions=args.resolutions)
+    print('%d thumbnails, %d rendered' % (len(keys), count))
+    return 0
+
+if __name__ == '__main__':
+    multiprocessing.freeze_support()
+    sys.exit(main())
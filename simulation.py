@@ -0,0 +1,633 @@
+import argparse
+import collections
+import glob
+import hashlib
+import json
+import sys
+import threading
+import numpy
+import motion
+from constants import *
+from store import load_keys
+
+GRAVITY = 1500.0 # acceleration at a planet's surface
+LAUNCH_SPEED = 300.0
+ROCKET_RADIUS = RADIUS_ROCKET / 2.0
+BOUNDS_MARGIN = 100
+TIME_STEP = 1 / 60.0
+MAX_TIME = 15.0 # shipped levels that complete at all first do so within it
+BROAD_CELL = 32.0 # grid cell of the collision broad phase
+BROAD_WINDOW = 0.5 # seconds of motion covered by a broad phase table
+BROAD_SAMPLES = 8
+FAR = 1e9 # where the padding of broad phase tables lies
+
+# launches fly ballistically unless a pilot is asked for; the pilot is a
+# rough stand-in for a player that heads for the nearest item, then the
+# nearest star, and turns away from obstacles ahead. Its constants and
+# the item rules are guesses at the game's feel, not measurements
+PILOT_TIME = 30.0
+STEER_RATE = 12.0 # radians per second
+AVOID_DISTANCE = 80.0
+AVOID_WEIGHT = 3.0
+NAV_CELL = 25.0
+NAV_PHASES = 64 # samples along the paths of moving obstacles
+NAV_TARGETS = 16 # static targets with their own maze distance field
+
+ZIPPER = 0
+MAGNET = 1
+SHIELD = 2
+ITEM_TIME = 10.0
+ZIPPER_BOOST = 1.5
+MAGNET_RADIUS = 100.0
+
+FIELD_STEP = 4
+FIELD_CACHE_SIZE = 32
+
+DEFAULT_ANGLES = 360
+PILOT_ANGLES = 120 # the pilot steers, so its launches need not be fine-grained
+DEFAULT_POWERS = (0.5, 0.75, 1.0)
+SHIPPED_LEVELS = ['files/lite.star', 'files/lite12.star', 'files/original.star', 'files/bonus_pack.star']
+
+FLYING = 0
+COMPLETE = 1
+CRASHED = 2
+LOST = 3
+
+def radii(keys, radius):
+    return numpy.array([radius * key.get('scale', DEFAULT_SCALE) for key in keys])
+
+def attraction(px, py, r2, x, y):
+    dx = px - x[..., numpy.newaxis]
+    dy = py - y[..., numpy.newaxis]
+    d2 = numpy.maximum(dx * dx + dy * dy, 1.0)
+    k = GRAVITY * r2 / (d2 * numpy.sqrt(d2))
+    return (k * dx).sum(axis=-1), (k * dy).sum(axis=-1)
+
+# Gravity Field
+def static_planets(key):
+    planets = key.get('entities', {}).get('planets', [])
+    return [planet for planet in planets if not planet.get('path', None)]
+
+def field_hash(level):
+    key = motion.level_key(level)
+    planets = [(p.get('x', 0), p.get('y', 0), p.get('scale', DEFAULT_SCALE)) for p in static_planets(key)]
+    data = json.dumps([list(key.get('bounds', DEFAULT_BOUNDS)), planets, FIELD_STEP])
+    return hashlib.sha1(data.encode('utf-8')).hexdigest()
+
+class GravityField(object):
+    def __init__(self, level, step=FIELD_STEP):
+        key = motion.level_key(level)
+        l, b, r, t = key.get('bounds', DEFAULT_BOUNDS)
+        l, b = l - BOUNDS_MARGIN, b - BOUNDS_MARGIN
+        r, t = r + BOUNDS_MARGIN, t + BOUNDS_MARGIN
+        self.step = float(step)
+        self.x0 = l
+        self.y0 = b
+        self.xs = numpy.arange(l, r + step, step, dtype=float)
+        self.ys = numpy.arange(b, t + step, step, dtype=float)
+        planets = static_planets(key)
+        self.count = len(planets)
+        gx, gy = numpy.meshgrid(self.xs, self.ys)
+        self.ax = numpy.zeros(gx.shape)
+        self.ay = numpy.zeros(gy.shape)
+        if planets:
+            px = numpy.array([p.get('x', 0) for p in planets], dtype=float)
+            py = numpy.array([p.get('y', 0) for p in planets], dtype=float)
+            r2 = radii(planets, RADIUS_PLANET) ** 2
+            for row in range(len(self.ys)):
+                self.ax[row], self.ay[row] = attraction(px, py, r2, gx[row], gy[row])
+    def lookup(self, x, y):
+        h, w = self.ax.shape
+        fx = (numpy.asarray(x, dtype=float) - self.x0) / self.step
+        fy = (numpy.asarray(y, dtype=float) - self.y0) / self.step
+        i = numpy.clip(numpy.floor(fx).astype(int), 0, w - 2)
+        j = numpy.clip(numpy.floor(fy).astype(int), 0, h - 2)
+        tx = numpy.clip(fx - i, 0, 1)
+        ty = numpy.clip(fy - j, 0, 1)
+        result = []
+        for grid in (self.ax, self.ay):
+            top = grid[j, i] * (1 - tx) + grid[j, i + 1] * tx
+            bottom = grid[j + 1, i] * (1 - tx) + grid[j + 1, i + 1] * tx
+            result.append(top * (1 - ty) + bottom * ty)
+        return result[0], result[1]
+    def heatmap(self):
+        magnitude = numpy.hypot(self.ax, self.ay)
+        value = numpy.log1p(magnitude)
+        peak = value.max()
+        if peak > 0:
+            value /= peak
+        rgb = numpy.zeros(value.shape + (3,), dtype=numpy.uint8)
+        rgb[..., 0] = numpy.clip(value * 2 - 1, 0, 1) * 255
+        rgb[..., 1] = numpy.clip(value * 2 - 1.5, 0, 1) * 2 * 255
+        rgb[..., 2] = numpy.clip(1 - abs(value * 2 - 1), 0, 1) * 160
+        return rgb[::-1]
+
+FIELDS = {}
+FIELD_ORDER = []
+FIELD_LOCK = threading.Lock() # sweeps and previews run on worker threads
+
+def get_field(level):
+    key = motion.level_key(level)
+    digest = field_hash(key)
+    with FIELD_LOCK:
+        field = FIELDS.get(digest)
+        if field is not None:
+            FIELD_ORDER.remove(digest)
+            FIELD_ORDER.append(digest)
+            return field
+    # built outside the lock, a race at worst builds a field twice
+    field = GravityField(key)
+    with FIELD_LOCK:
+        if digest not in FIELDS:
+            FIELD_ORDER.append(digest)
+        FIELDS[digest] = field
+        while len(FIELD_ORDER) > FIELD_CACHE_SIZE:
+            FIELDS.pop(FIELD_ORDER.pop(0), None)
+    return field
+
+class Cells(object):
+    # the broad phase grid over a level's bounds and margin
+    def __init__(self, bounds):
+        l, b, r, t = bounds
+        self.x0, self.y0 = l - BOUNDS_MARGIN, b - BOUNDS_MARGIN
+        self.w = int((r - l + 2 * BOUNDS_MARGIN) / BROAD_CELL) + 1
+        self.h = int((t - b + 2 * BOUNDS_MARGIN) / BROAD_CELL) + 1
+    def __len__(self):
+        return self.w * self.h
+    def cell(self, x, y):
+        i = numpy.clip(numpy.floor((x - self.x0) / BROAD_CELL).astype(int), 0, self.w - 1)
+        j = numpy.clip(numpy.floor((y - self.y0) / BROAD_CELL).astype(int), 0, self.h - 1)
+        return i, j
+    def index(self, x, y):
+        i, j = self.cell(x, y)
+        return j * self.w + i
+
+def bucket(count, cells, indices):
+    # a table with a row per cell listing the indices in it, padded with -1
+    cells = numpy.asarray(cells, dtype=int)
+    order = numpy.argsort(cells, kind='mergesort')
+    cells = cells[order]
+    sizes = numpy.bincount(cells, minlength=count)
+    starts = numpy.cumsum(sizes) - sizes
+    table = numpy.empty((count, max(1, sizes.max() if len(cells) else 0)), dtype=int)
+    table.fill(-1)
+    table[cells, numpy.arange(len(cells)) - starts[cells]] = numpy.asarray(indices, dtype=int)[order]
+    return table
+
+class Circles(object):
+    # broad phase for one kind of entity: each cell lists the circles that
+    # can come within reach of any point in it; moving circles are listed
+    # by the box they sweep in each window of time, built when first used
+    def __init__(self, group, radius, reach, cells):
+        self.group = group
+        self.radius = numpy.resize(numpy.asarray(radius, dtype=float), len(group))
+        self.reach = reach
+        self.cells = cells
+        self.moving = numpy.nonzero(group.moving)[0]
+        self.far = numpy.append(group.x, FAR), numpy.append(group.y, FAR)
+        self.fixed = ([], [])
+        for index in numpy.nonzero(~group.moving)[0]:
+            size = self.radius[index] + reach
+            x, y = group.x[index], group.y[index]
+            self.insert(self.fixed, index, x - size, y - size, x + size, y + size)
+        self.tables = {}
+    def insert(self, pairs, index, l, b, r, t):
+        i0, j0 = self.cells.cell(l, b)
+        i1, j1 = self.cells.cell(r, t)
+        for j in range(j0, j1 + 1):
+            for i in range(i0, i1 + 1):
+                pairs[0].append(j * self.cells.w + i)
+                pairs[1].append(index)
+    def table(self, t):
+        window = int(t // BROAD_WINDOW) if len(self.moving) else 0
+        table = self.tables.get(window)
+        if table is None:
+            pairs = (list(self.fixed[0]), list(self.fixed[1]))
+            if len(self.moving):
+                # sampled positions, padded by the distance a circle can
+                # travel between two samples
+                group, moving = self.group, self.moving
+                step = BROAD_WINDOW / BROAD_SAMPLES
+                times = window * BROAD_WINDOW + numpy.arange(BROAD_SAMPLES + 1) * step
+                xs, ys = group.track(moving, times)
+                speed = numpy.abs(group.omega[moving]) * numpy.maximum(numpy.abs(group.ax[moving]), numpy.abs(group.ay[moving]))
+                size = self.radius[moving] + self.reach + speed * step / 2
+                l, b = xs.min(axis=0) - size, ys.min(axis=0) - size
+                r, t = xs.max(axis=0) + size, ys.max(axis=0) + size
+                for k, index in enumerate(moving):
+                    self.insert(pairs, index, l[k], b[k], r[k], t[k])
+            table = self.tables[window] = bucket(len(self.cells), *pairs)
+        return table
+    def __len__(self):
+        return len(self.group)
+    def near(self, t, x, y, cell):
+        # candidates of each rocket, padded with -1, and the offsets and
+        # distances to them; padding picks a point far away
+        index = self.table(t)[cell]
+        if len(self.moving):
+            px, py = self.group.positions(t)
+            px, py = numpy.append(px, FAR), numpy.append(py, FAR)
+        else:
+            px, py = self.far
+        dx = x[:, numpy.newaxis] - px[index]
+        dy = y[:, numpy.newaxis] - py[index]
+        return index, dx, dy, numpy.sqrt(dx * dx + dy * dy)
+
+class World(object):
+    def __init__(self, level):
+        key = motion.level_key(level)
+        entities = key.get('entities', {})
+        self.bounds = tuple(key.get('bounds', DEFAULT_BOUNDS))
+        self.rockets = [(k.get('x', 0), k.get('y', 0)) for k in entities.get('rockets', [])]
+        planets = entities.get('planets', [])
+        self.planets = motion.Motion(planets)
+        self.planet_radius = radii(planets, RADIUS_PLANET)
+        bumpers = entities.get('bumpers', [])
+        self.bumpers = motion.Motion(bumpers)
+        self.bumper_radius = radii(bumpers, RADIUS_BUMPER)
+        asteroids = entities.get('asteroids', [])
+        self.asteroids = motion.Motion(asteroids)
+        self.asteroid_radius = radii(asteroids, RADIUS_ASTEROID)
+        self.stars = motion.Motion(entities.get('stars', []))
+        items = entities.get('items', [])
+        self.items = motion.Motion(items)
+        self.item_types = numpy.array([item.get('type', 0) for item in items], dtype=int)
+        teleports = entities.get('teleports', [])
+        self.teleports = motion.Motion(teleports)
+        numbers = {}
+        for index, teleport in enumerate(teleports):
+            numbers.setdefault(teleport.get('number', 0), index)
+        exits = [numbers.get(teleport.get('target', 0), -1) for teleport in teleports]
+        self.exits = numpy.array(exits, dtype=int)
+        self.field = get_field(key) if static_planets(key) else None
+        moving = self.planets.moving
+        self.moving_planets = moving.any()
+        self.moving_r2 = self.planet_radius[moving] ** 2
+        self.cells = cells = Cells(self.bounds)
+        self.star_cells = Circles(self.stars, RADIUS_STAR, ROCKET_RADIUS, cells)
+        self.bumper_cells = Circles(self.bumpers, self.bumper_radius, ROCKET_RADIUS, cells)
+        self.teleport_cells = Circles(self.teleports, RADIUS_TELEPORT, ROCKET_RADIUS, cells)
+        # the second value tells whether a shield carries a rocket through
+        self.obstacles = [
+            (Circles(self.planets, self.planet_radius, ROCKET_RADIUS, cells), False),
+            (Circles(self.asteroids, self.asteroid_radius, ROCKET_RADIUS, cells), True),
+        ]
+        self._navigator = None
+        self._lookout = None
+    def gravity(self, t, x, y):
+        if self.field is not None:
+            ax, ay = self.field.lookup(x, y)
+        else:
+            ax, ay = numpy.zeros_like(x), numpy.zeros_like(y)
+        if self.moving_planets:
+            moving = self.planets.moving
+            px, py = self.planets.positions(t)
+            mx, my = attraction(px[moving], py[moving], self.moving_r2, x, y)
+            ax = ax + mx
+            ay = ay + my
+        return ax, ay
+    # the pilot's own structures are built on first use
+    @property
+    def navigator(self):
+        if self._navigator is None:
+            self._navigator = Navigator(self)
+        return self._navigator
+    @property
+    def lookout(self):
+        if self._lookout is None:
+            reach = ROCKET_RADIUS + AVOID_DISTANCE
+            self._lookout = [
+                (Circles(self.planets, self.planet_radius, reach, self.cells), False),
+                (Circles(self.asteroids, self.asteroid_radius, reach, self.cells), True),
+            ]
+        return self._lookout
+
+class Navigator(object):
+    # breadth-first distance fields over a coarse grid of the static
+    # obstacles, one per static target, so the pilot follows corridors
+    # instead of flying straight at a wall
+    def __init__(self, world):
+        l, b, r, t = world.bounds
+        self.x0, self.y0 = l, b
+        self.w = int((r - l) / NAV_CELL) + 1
+        self.h = int((t - b) / NAV_CELL) + 1
+        gx, gy = numpy.meshgrid(l + numpy.arange(self.w) * NAV_CELL, b + numpy.arange(self.h) * NAV_CELL)
+        blocked = numpy.zeros((self.h, self.w), dtype=bool)
+        for group, radius in ((world.planets, world.planet_radius), (world.asteroids, world.asteroid_radius),
+                (world.bumpers, world.bumper_radius)):
+            # moving obstacles block everywhere along their paths
+            phases = numpy.linspace(0, 2 * numpy.pi, NAV_PHASES, endpoint=False)[:, numpy.newaxis]
+            xs = numpy.where(group.moving, group.cx + group.ax * numpy.cos(phases + group.px), group.x)
+            ys = numpy.where(group.moving, group.cy + group.ay * numpy.cos(phases + group.py), group.y)
+            sizes = numpy.resize(radius, xs.shape)
+            for x, y, size in set(zip(xs.ravel(), ys.ravel(), sizes.ravel())):
+                blocked |= (gx - x) ** 2 + (gy - y) ** 2 < (size + ROCKET_RADIUS) ** 2
+        # a static teleport's cell leads to its exit's cell
+        self.entries = {}
+        teleports = world.teleports
+        for index, exit in enumerate(world.exits):
+            if exit >= 0 and not teleports.moving[index] and not teleports.moving[exit]:
+                entry = self.cell(teleports.x[index], teleports.y[index])
+                self.entries.setdefault(self.cell(teleports.x[exit], teleports.y[exit]), []).append(entry)
+        targets = [(world.stars, index) for index in range(len(world.stars))]
+        targets += [(world.items, index) for index in range(len(world.items))]
+        self.fields = numpy.empty((len(targets), self.h, self.w))
+        self.fields.fill(numpy.inf)
+        if not blocked.any():
+            return
+        # items first, as the pilot heads for them first
+        order = sorted(range(len(targets)), key=lambda index: targets[index][0] is world.stars)
+        static = [index for index in order if not targets[index][0].moving[targets[index][1]]]
+        for index in static[:NAV_TARGETS]:
+            group, target = targets[index]
+            self.search(self.fields[index], blocked, *self.cell(group.x[target], group.y[target]))
+    def cell(self, x, y):
+        i = numpy.clip(numpy.floor((x - self.x0) / NAV_CELL + 0.5).astype(int), 0, self.w - 1)
+        j = numpy.clip(numpy.floor((y - self.y0) / NAV_CELL + 0.5).astype(int), 0, self.h - 1)
+        if i.ndim == 0:
+            return int(i), int(j)
+        return i, j
+    def search(self, field, blocked, i, j):
+        # the target's own cell may be blocked, e.g. a star inside an asteroid
+        field[j, i] = 0
+        queue = collections.deque([(i, j)])
+        while queue:
+            i, j = queue.popleft()
+            value = field[j, i] + 1
+            neighbors = [(i - 1, j), (i + 1, j), (i, j - 1), (i, j + 1)] + self.entries.get((i, j), [])
+            for ni, nj in neighbors:
+                if 0 <= ni < self.w and 0 <= nj < self.h and not blocked[nj, ni] and field[nj, ni] > value:
+                    field[nj, ni] = value
+                    queue.append((ni, nj))
+    def distances(self, x, y):
+        # path length from each rocket to each target, inf where unknown
+        i, j = self.cell(x, y)
+        return self.fields[:, j, i].T * NAV_CELL
+    def directions(self, x, y, targets):
+        # unit steps down the chosen targets' fields; zero where unknown
+        i, j = self.cell(x, y)
+        best = self.fields[targets, j, i]
+        dx = numpy.zeros(len(x))
+        dy = numpy.zeros(len(x))
+        for di in (-1, 0, 1):
+            for dj in (-1, 0, 1):
+                ni = numpy.clip(i + di, 0, self.w - 1)
+                nj = numpy.clip(j + dj, 0, self.h - 1)
+                value = self.fields[targets, nj, ni]
+                better = value < best
+                best = numpy.where(better, value, best)
+                dx = numpy.where(better, di, dx)
+                dy = numpy.where(better, dj, dy)
+        norm = numpy.maximum(numpy.hypot(dx, dy), 1e-9)
+        return dx / norm, dy / norm
+
+class Result(object):
+    def __init__(self, angles, powers, stars, total, outcomes, times, paths=None):
+        self.angles = angles
+        self.powers = powers
+        self.stars = stars
+        self.total = total
+        self.outcomes = outcomes
+        self.times = times
+        self.paths = paths
+    @property
+    def complete(self):
+        return self.outcomes == COMPLETE
+
+def distances(motion, t, x, y):
+    px, py = motion.positions(t)
+    dx = x[:, numpy.newaxis] - px
+    dy = y[:, numpy.newaxis] - py
+    return dx, dy, numpy.sqrt(dx * dx + dy * dy)
+
+def steer(world, now, x, y, vx, vy, pending, shielded, powered, cell):
+    # turns each velocity towards the pilot's heading, at most STEER_RATE
+    sx, sy = world.stars.positions(now)
+    ix, iy = world.items.positions(now)
+    tx = numpy.concatenate([sx, ix])
+    ty = numpy.concatenate([sy, iy])
+    if not len(tx):
+        return vx, vy
+    dx = tx - x[:, numpy.newaxis]
+    dy = ty - y[:, numpy.newaxis]
+    distance = numpy.sqrt(dx * dx + dy * dy)
+    paths = world.navigator.distances(x, y)
+    cost = numpy.where(numpy.isinf(paths), distance, paths)
+    # items first, as they are what make the rest of a level reachable
+    wanted = pending.copy()
+    wanted[pending[:, len(sx):].any(axis=1), :len(sx)] = False
+    cost[~wanted] = numpy.inf
+    target = cost.argmin(axis=1)
+    rows = numpy.arange(len(x))
+    hx = dx[rows, target] / numpy.maximum(distance[rows, target], 1e-9)
+    hy = dy[rows, target] / numpy.maximum(distance[rows, target], 1e-9)
+    reach = distance[rows, target]
+    nx, ny = world.navigator.directions(x, y, target)
+    known = (nx != 0) | (ny != 0)
+    hx = numpy.where(known, nx, hx)
+    hy = numpy.where(known, ny, hy)
+    speed = numpy.hypot(vx, vy)
+    ux, uy = vx / numpy.maximum(speed, 1e-9), vy / numpy.maximum(speed, 1e-9)
+    for cells, shieldable in world.lookout:
+        if not len(cells):
+            continue
+        index, ox, oy, d = cells.near(now, x, y, cell)
+        gap = d - cells.radius[index] - ROCKET_RADIUS
+        ox, oy = ox / numpy.maximum(d, 1e-9), oy / numpy.maximum(d, 1e-9)
+        # obstacles beyond the target do not stand in the way
+        ahead = (ox * ux[:, numpy.newaxis] + oy * uy[:, numpy.newaxis] < 0) & (gap < AVOID_DISTANCE)
+        ahead &= gap < reach[:, numpy.newaxis]
+        if shieldable:
+            ahead &= ~shielded[:, numpy.newaxis]
+        closeness = 1 - numpy.clip(gap, 0, AVOID_DISTANCE) / AVOID_DISTANCE
+        weight = numpy.where(ahead, closeness ** 2, 0) * AVOID_WEIGHT
+        hx = hx + (weight * ox).sum(axis=1)
+        hy = hy + (weight * oy).sum(axis=1)
+    heading = numpy.arctan2(uy, ux)
+    turn = (numpy.arctan2(hy, hx) - heading + numpy.pi) % (2 * numpy.pi) - numpy.pi
+    heading += numpy.clip(turn, -STEER_RATE * TIME_STEP, STEER_RATE * TIME_STEP)
+    return numpy.cos(heading) * speed, numpy.sin(heading) * speed
+
+def simulate(world, x0, y0, angles, powers=1.0, trace=False, cancelled=None, pilot=False):
+    angles = numpy.asarray(angles, dtype=float)
+    powers = numpy.resize(numpy.asarray(powers, dtype=float), angles.shape)
+    count = len(angles)
+    radians = numpy.radians(angles)
+    outcomes = numpy.zeros(count, dtype=int)
+    times = numpy.zeros(count)
+    stars = numpy.zeros(count, dtype=int)
+    # only rockets still flying are stepped; ids maps them to their launches
+    ids = numpy.arange(count)
+    x = numpy.empty(count)
+    y = numpy.empty(count)
+    x.fill(x0)
+    y.fill(y0)
+    vx = numpy.cos(radians) * powers * LAUNCH_SPEED
+    vy = numpy.sin(radians) * powers * LAUNCH_SPEED
+    inside = numpy.zeros(count, dtype=bool)
+    collected = numpy.zeros((count, len(world.stars)), dtype=bool)
+    got = numpy.zeros(count, dtype=int)
+    taken = numpy.zeros((count, len(world.items)), dtype=bool)
+    magnet = numpy.zeros(count)
+    shield = numpy.zeros(count)
+    l, b, r, t = world.bounds
+    l, b, r, t = l - BOUNDS_MARGIN, b - BOUNDS_MARGIN, r + BOUNDS_MARGIN, t + BOUNDS_MARGIN
+    dt = TIME_STEP
+    paths = [(x.copy(), y.copy())] if trace else None
+    now = 0.0
+    for step in range(int((PILOT_TIME if pilot else MAX_TIME) / dt)):
+        if not len(ids):
+            break
+        if cancelled and cancelled():
+            return None
+        now = step * dt
+        if pilot:
+            pending = numpy.concatenate([~collected, ~taken], axis=1)
+            vx, vy = steer(world, now, x, y, vx, vy, pending, shield > now, (shield > now) | (magnet > now),
+                world.cells.index(x, y))
+        ax, ay = world.gravity(now, x, y)
+        vx += ax * dt
+        vy += ay * dt
+        x += vx * dt
+        y += vy * dt
+        now += dt
+        rows = numpy.arange(len(ids))
+        cell = world.cells.index(x, y)
+        # Items, which only the pilot uses
+        if pilot and len(world.items):
+            dx, dy, d = distances(world.items, now, x, y)
+            hit = (d < RADIUS_ITEM + ROCKET_RADIUS) & ~taken
+            taken |= hit
+            boost = numpy.where((hit & (world.item_types == ZIPPER)).any(axis=1), ZIPPER_BOOST, 1.0)
+            vx *= boost
+            vy *= boost
+            magnet[(hit & (world.item_types == MAGNET)).any(axis=1)] = now + ITEM_TIME
+            shield[(hit & (world.item_types == SHIELD)).any(axis=1)] = now + ITEM_TIME
+        # Stars
+        if len(world.stars):
+            index, dx, dy, d = world.star_cells.near(now, x, y, cell)
+            hit, column = numpy.nonzero(d < RADIUS_STAR + ROCKET_RADIUS)
+            star = index[hit, column]
+            new = ~collected[hit, star]
+            collected[hit[new], star[new]] = True
+            got += numpy.bincount(hit[new], minlength=len(ids))
+            pulling = magnet > now
+            if pulling.any():
+                dx, dy, d = distances(world.stars, now, x[pulling], y[pulling])
+                collected[pulling] |= d < MAGNET_RADIUS
+                got[pulling] = collected[pulling].sum(axis=1)
+        # Bumpers
+        if len(world.bumpers):
+            index, dx, dy, d = world.bumper_cells.near(now, x, y, cell)
+            gap = d - world.bumper_radius[index] - ROCKET_RADIUS
+            nearest = gap.argmin(axis=1)
+            hit = gap[rows, nearest] < 0
+            if hit.any():
+                nx = dx[rows, nearest] / numpy.maximum(d[rows, nearest], 1e-9)
+                ny = dy[rows, nearest] / numpy.maximum(d[rows, nearest], 1e-9)
+                dot = vx * nx + vy * ny
+                bounce = hit & (dot < 0)
+                vx -= 2 * dot * nx * bounce
+                vy -= 2 * dot * ny * bounce
+                push = numpy.where(hit, -gap[rows, nearest], 0)
+                x += nx * push
+                y += ny * push
+                cell = world.cells.index(x, y)
+        # Teleports
+        if len(world.teleports):
+            index, dx, dy, d = world.teleport_cells.near(now, x, y, cell)
+            nearest = d.argmin(axis=1)
+            within = d[rows, nearest] < RADIUS_TELEPORT + ROCKET_RADIUS
+            exits = world.exits[index[rows, nearest]]
+            hop = within & ~inside & (exits >= 0)
+            if hop.any():
+                tx, ty = world.teleports.positions(now)
+                x[hop] = tx[exits[hop]]
+                y[hop] = ty[exits[hop]]
+                cell = world.cells.index(x, y)
+            inside = within | hop
+        # Planets and Asteroids; with the pilot, a shield carries the
+        # rocket through asteroids
+        outcome = numpy.zeros(len(ids), dtype=int)
+        for cells, shieldable in world.obstacles:
+            if len(cells):
+                index, dx, dy, d = cells.near(now, x, y, cell)
+                crashed = (d < cells.radius[index] + ROCKET_RADIUS).any(axis=1)
+                if shieldable:
+                    crashed &= shield <= now
+                outcome[crashed] = CRASHED
+        lost = (outcome == FLYING) & ((x < l) | (y < b) | (x > r) | (y > t))
+        outcome[lost] = LOST
+        if collected.shape[1]:
+            outcome[(outcome == FLYING) & (got == collected.shape[1])] = COMPLETE
+        if trace:
+            px, py = paths[-1][0].copy(), paths[-1][1].copy()
+            px[ids] = x
+            py[ids] = y
+            paths.append((px, py))
+        done = outcome != FLYING
+        if done.any():
+            finished = ids[done]
+            outcomes[finished] = outcome[done]
+            times[finished] = now
+            stars[finished] = got[done]
+            keep = ~done
+            ids, x, y, vx, vy, inside = ids[keep], x[keep], y[keep], vx[keep], vy[keep], inside[keep]
+            collected, got, taken = collected[keep], got[keep], taken[keep]
+            magnet, shield = magnet[keep], shield[keep]
+    times[ids] = now
+    stars[ids] = got
+    if not len(world.stars):
+        outcomes[outcomes == FLYING] = COMPLETE
+    return Result(angles, powers, stars, len(world.stars), outcomes, times, paths)
+
+def sweep(level, count=DEFAULT_ANGLES, powers=DEFAULT_POWERS, pilot=False):
+    world = level if isinstance(level, World) else World(level)
+    angles = numpy.arange(count) * 360.0 / count
+    grid_angles, grid_powers = numpy.meshgrid(angles, powers)
+    results = []
+    for x, y in world.rockets:
+        results.append(simulate(world, x, y, grid_angles.ravel(), grid_powers.ravel(), pilot=pilot))
+    return results
+
+def trajectory(level, rocket=0, angle=90.0, power=1.0, cancelled=None, pilot=False):
+    world = level if isinstance(level, World) else World(level)
+    if rocket >= len(world.rockets):
+        return []
+    x, y = world.rockets[rocket]
+    result = simulate(world, x, y, [angle], [power], True, cancelled, pilot)
+    if result is None:
+        return None
+    return [(float(px[0]), float(py[0])) for px, py in result.paths]
+
+# Command Line
+def main(args=None):
+    # regression check: every shipped level must score, i.e. some launch
+    # collects a star, or completes a level without stars; shipped levels
+    # are steered, so they are flown with the pilot
+    parser = argparse.ArgumentParser(description='Check that Star Rocket levels can be scored.')
+    parser.add_argument('paths', nargs='*', default=SHIPPED_LEVELS, help='.star files (wildcards allowed)')
+    parser.add_argument('-n', '--angles', type=int, default=PILOT_ANGLES, help='launch angles per rocket')
+    args = parser.parse_args(args)
+    paths = []
+    for pattern in args.paths:
+        paths.extend(sorted(glob.glob(pattern)) or [pattern])
+    failures = skipped = 0
+    for path in paths:
+        for index, key in enumerate(load_keys(path)):
+            results = sweep(key, args.angles, pilot=True)
+            if not results:
+                status = 'SKIP (no rockets)'
+                skipped += 1
+            elif not max((result.stars + result.complete).max() for result in results):
+                status = 'FAIL'
+                failures += 1
+            else:
+                continue
+            print('%s\t%d\t%s\t%s' % (path, index + 1, key.get('name', ''), status))
+            sys.stdout.flush()
+    print('%d levels failed, %d skipped' % (failures, skipped))
+    return 1 if failures else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
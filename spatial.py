@@ -0,0 +1,95 @@
+import heapq
+import math
+
+class Grid(object):
+    def __init__(self, size):
+        self.size = float(size)
+        self.cells = {}
+        self.items = {}
+    def __len__(self):
+        return len(self.items)
+    def __contains__(self, item):
+        return item in self.items
+    def cell_range(self, x, y, radius):
+        size = self.size
+        i0 = int(math.floor((x - radius) / size))
+        j0 = int(math.floor((y - radius) / size))
+        i1 = int(math.floor((x + radius) / size))
+        j1 = int(math.floor((y + radius) / size))
+        return i0, j0, i1, j1
+    def insert(self, item, x, y, radius=0):
+        if item in self.items:
+            self.remove(item)
+        entry = (x, y, radius, item)
+        i0, j0, i1, j1 = self.cell_range(x, y, radius)
+        cells = self.cells
+        for i in range(i0, i1 + 1):
+            for j in range(j0, j1 + 1):
+                key = (i, j)
+                if key in cells:
+                    cells[key].append(entry)
+                else:
+                    cells[key] = [entry]
+        self.items[item] = entry
+    def remove(self, item):
+        entry = self.items.pop(item, None)
+        if entry is None:
+            return
+        x, y, radius, dummy = entry
+        i0, j0, i1, j1 = self.cell_range(x, y, radius)
+        cells = self.cells
+        for i in range(i0, i1 + 1):
+            for j in range(j0, j1 + 1):
+                key = (i, j)
+                bucket = cells[key]
+                bucket.remove(entry)
+                if not bucket:
+                    del cells[key]
+    def query(self, x, y, radius=0):
+        result = []
+        seen = set()
+        i0, j0, i1, j1 = self.cell_range(x, y, radius)
+        cells = self.cells
+        for i in range(i0, i1 + 1):
+            for j in range(j0, j1 + 1):
+                for entry in cells.get((i, j), ()):
+                    ex, ey, er, item = entry
+                    dx, dy, d = ex - x, ey - y, er + radius
+                    if dx * dx + dy * dy < d * d and item not in seen:
+                        seen.add(item)
+                        result.append(item)
+        return result
+    def overlaps(self, x, y, radius=0):
+        i0, j0, i1, j1 = self.cell_range(x, y, radius)
+        cells = self.cells
+        for i in range(i0, i1 + 1):
+            for j in range(j0, j1 + 1):
+                for ex, ey, er, item in cells.get((i, j), ()):
+                    dx, dy, d = ex - x, ey - y, er + radius
+                    if dx * dx + dy * dy < d * d:
+                        return True
+        return False
+
+def sweep(circles):
+    if circles:
+        xs = [x for x, y, r in circles]
+        ys = [y for x, y, r in circles]
+        if max(ys) - min(ys) > max(xs) - min(xs):
+            circles = [(y, x, r) for x, y, r in circles]
+    order = sorted(range(len(circles)), key=lambda i: circles[i][0] - circles[i][2])
+    heap = []
+    active = set()
+    pairs = []
+    for i in order:
+        x, y, r = circles[i]
+        left = x - r
+        while heap and heap[0][0] <= left:
+            active.discard(heapq.heappop(heap)[1])
+        for j in active:
+            ox, oy, other = circles[j]
+            dx, dy, d = ox - x, oy - y, other + r
+            if dx * dx + dy * dy < d * d:
+                pairs.append((j, i) if j < i else (i, j))
+        active.add(i)
+        heapq.heappush(heap, (x + r, i))
+    return pairs
@@ -0,0 +1,139 @@
+import argparse
+import glob
+import hashing
+import json
+import os
+import sys
+import tempfile
+
+STORE_NAME = 'store'
+FILE_MODE = 0o644 # mkstemp files are private to the user
+
+stores = {} # by root, so each remembers the objects it has verified
+
+def replace(source, path):
+    # atomic where the platform allows it; Python 2 on Windows cannot
+    # rename over an existing file
+    if hasattr(os, 'replace'):
+        os.replace(source, path)
+    elif os.name != 'nt' or not os.path.exists(path):
+        os.rename(source, path)
+    else:
+        os.remove(path)
+        os.rename(source, path)
+
+class Store(object):
+    # digests name their content, so parsed levels are shared by all stores
+    cache = {}
+    def __init__(self, root):
+        self.root = root
+        self.known = set()
+    def path(self, digest):
+        return os.path.join(self.root, digest[:2], digest + '.json')
+    def __contains__(self, digest):
+        # like put, an existing object only counts once its content is
+        # found to match its name
+        if digest in self.known:
+            return True
+        path = self.path(digest)
+        if not os.path.exists(path):
+            return False
+        with open(path, 'r') as file:
+            key = json.loads(file.read())
+        if hashing.level_hash(key) != digest:
+            return False
+        self.known.add(digest)
+        Store.cache[digest] = key
+        return True
+    def put(self, level):
+        # accepts a Level or a level key; objects are named by the level
+        # hash, so a known level is skipped without building its key, and
+        # an existing object is only trusted if its bytes match
+        digest = level.hash if hasattr(level, 'hash') else hashing.level_hash(level)
+        if digest in self.known:
+            return digest, False
+        key = getattr(level, 'key', level)
+        data = json.dumps(key, sort_keys=True)
+        path = self.path(digest)
+        if os.path.exists(path):
+            with open(path, 'r') as file:
+                if file.read() == data:
+                    self.known.add(digest)
+                    return digest, False
+        folder = os.path.dirname(path)
+        if not os.path.isdir(folder):
+            os.makedirs(folder)
+        handle, temp = tempfile.mkstemp(suffix='.tmp', dir=folder)
+        try:
+            with os.fdopen(handle, 'w') as file:
+                file.write(data)
+            os.chmod(temp, FILE_MODE)
+            replace(temp, path)
+        finally:
+            if os.path.exists(temp):
+                os.remove(temp)
+        self.known.add(digest)
+        Store.cache[digest] = json.loads(data)
+        return digest, True
+    def get(self, digest):
+        key = Store.cache.get(digest)
+        if key is None:
+            with open(self.path(digest), 'r') as file:
+                key = json.loads(file.read())
+            Store.cache[digest] = key
+        return key
+
+def is_manifest(data):
+    return isinstance(data, dict) and 'levels' in data
+
+def store_for(path, data=None):
+    name = data.get('store', STORE_NAME) if data else STORE_NAME
+    root = os.path.join(os.path.dirname(os.path.abspath(path)), name)
+    store = stores.get(root)
+    if store is None:
+        store = stores[root] = Store(root)
+    return store
+
+def load(path):
+    with open(path, 'r') as file:
+        data = json.loads(file.read())
+    if not is_manifest(data):
+        return data, False
+    store = store_for(path, data)
+    return [store.get(digest) for digest in data['levels']], True
+
+def load_keys(path):
+    return load(path)[0]
+
+def save_manifest(path, levels):
+    store = store_for(path)
+    digests = []
+    written = 0
+    for level in levels:
+        digest, new = store.put(level)
+        digests.append(digest)
+        written += new
+    data = json.dumps({'store': STORE_NAME, 'levels': digests}, indent=1)
+    with open(path, 'w') as file:
+        file.write(data)
+    return written
+
+# Command Line
+def main(args=None):
+    parser = argparse.ArgumentParser(description='Store Star Rocket levels as draft manifests.')
+    parser.add_argument('paths', nargs='+', help='.star files (wildcards allowed)')
+    parser.add_argument('-o', '--output', required=True, help='directory for the manifests and their store')
+    args = parser.parse_args(args)
+    paths = []
+    for pattern in args.paths:
+        paths.extend(sorted(glob.glob(pattern)) or [pattern])
+    if not os.path.isdir(args.output):
+        os.makedirs(args.output)
+    for path in paths:
+        keys = load_keys(path)
+        written = save_manifest(os.path.join(args.output, os.path.basename(path)), keys)
+        print('%s\t%d levels\t%d new' % (path, len(keys), written))
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,182 @@
+import math
+
+class Network(object):
+    def __init__(self):
+        self.reset()
+    def reset(self):
+        self.items = {}
+        self.numbers = {}
+        self.version = 0
+        self._cycles = None
+    def update(self, items):
+        old = self.items
+        changed = [key for key, item in items.items() if key not in old or old[key].state != item.state]
+        removed = [key for key in old if key not in items]
+        if not changed and not removed:
+            return False
+        for key in removed:
+            self.discard(key)
+        for key in changed:
+            self.discard(key)
+            self.add(key, items[key])
+        self.version += 1
+        self._cycles = None
+        return True
+    def add(self, key, item):
+        self.items[key] = item
+        self.numbers.setdefault(item.number, set()).add(key)
+    def discard(self, key):
+        item = self.items.pop(key, None)
+        if item is None:
+            return
+        keys = self.numbers[item.number]
+        keys.discard(key)
+        if not keys:
+            del self.numbers[item.number]
+    def targets(self, key):
+        item = self.items[key]
+        return [other for other in self.numbers.get(item.target, ()) if other != key]
+    def links(self):
+        return [(key, other) for key in self.items for other in self.targets(key)]
+    def duplicates(self):
+        return [(number, keys) for number, keys in self.numbers.items() if len(keys) > 1]
+    def dangling(self):
+        return [key for key, item in self.items.items() if item.target not in self.numbers]
+    def cycles(self):
+        if self._cycles is None:
+            self._cycles = self.find_cycles()
+        return self._cycles
+    def find_cycles(self):
+        # strongly connected components of the number -> target graph;
+        # a component of three or more numbers is a loop, two are a pair;
+        # each loop is listed as its numbers and whether it is one cycle
+        edges = {}
+        for number, keys in self.numbers.items():
+            targets = set(self.items[key].target for key in keys)
+            edges[number] = sorted(target for target in targets if target in self.numbers and target != number)
+        index = {}
+        low = {}
+        stack = []
+        on_stack = set()
+        result = []
+        for root in sorted(edges):
+            if root in index:
+                continue
+            work = [(root, 0)]
+            while work:
+                node, position = work.pop()
+                if position == 0:
+                    index[node] = low[node] = len(index)
+                    stack.append(node)
+                    on_stack.add(node)
+                children = edges[node]
+                if position < len(children):
+                    work.append((node, position + 1))
+                    child = children[position]
+                    if child not in index:
+                        work.append((child, 0))
+                    elif child in on_stack:
+                        low[node] = min(low[node], index[child])
+                    continue
+                if work:
+                    parent = work[-1][0]
+                    low[parent] = min(low[parent], low[node])
+                if low[node] == index[node]:
+                    component = []
+                    while True:
+                        other = stack.pop()
+                        on_stack.discard(other)
+                        component.append(other)
+                        if other == node:
+                            break
+                    if len(component) > 2:
+                        cycle = self.order_cycle(component, edges)
+                        result.append((cycle or sorted(component), cycle is not None))
+        return result
+    def order_cycle(self, component, edges):
+        # the numbers in link order if the component is a single cycle,
+        # i.e. each number leads to exactly one other member; else None
+        members = set(component)
+        following = {}
+        for number in component:
+            targets = [target for target in edges[number] if target in members]
+            if len(targets) != 1:
+                return None
+            following[number] = targets[0]
+        number = min(component)
+        result = [number]
+        while following[number] != result[0]:
+            number = following[number]
+            result.append(number)
+        return result
+    def problems(self):
+        items = self.items
+        result = []
+        for key in self.dangling():
+            item = items[key]
+            result.append(('%s targets missing number %d' % (item.label, item.target), (key,)))
+        for key, item in items.items():
+            if item.target == item.number:
+                result.append(('%s targets itself' % item.label, (key,)))
+        for number, keys in self.duplicates():
+            keys = sorted(keys, key=lambda k: items[k].label)
+            result.append(('Teleport number %d is used %d times' % (number, len(keys)), keys))
+        for numbers, simple in self.cycles():
+            keys = [key for number in numbers for key in sorted(self.numbers[number], key=lambda k: items[k].label)]
+            if simple:
+                path = ' -> '.join(str(number) for number in numbers + numbers[:1])
+                result.append(('Teleport cycle %s' % path, keys))
+            else:
+                listed = ', '.join(str(number) for number in numbers)
+                result.append(('Teleport numbers %s link into each other' % listed, keys))
+        return result
+    def renumber(self, keys):
+        items = self.items
+        keys = sorted((key for key in keys if key in items), key=lambda k: (items[k].number, items[k].x, items[k].y))
+        selected = set(keys)
+        used = set(number for number, holders in self.numbers.items() if holders - selected)
+        numbers = {}
+        for key in keys:
+            number = items[key].number
+            if number not in used:
+                used.add(number)
+                numbers[key] = number
+        free = 1
+        for key in keys:
+            if key not in numbers:
+                while free in used:
+                    free += 1
+                used.add(free)
+                numbers[key] = free
+        holders = {}
+        for key in keys:
+            holders.setdefault(items[key].number, []).append(key)
+        result = {}
+        for key in keys:
+            item = items[key]
+            target = item.target
+            choices = [other for other in holders.get(target, ()) if other != key] or holders.get(target, ())
+            if choices:
+                nearest = min(choices, key=lambda k: math.hypot(items[k].x - item.x, items[k].y - item.y))
+                target = numbers[nearest]
+            result[key] = (numbers[key], target)
+        return result
+
+def arrows(network, radius, head=8.0):
+    # line segments for each link, trimmed to the teleport edges
+    result = []
+    for key, other in network.links():
+        a, b = network.items[key], network.items[other]
+        dx, dy = b.x - a.x, b.y - a.y
+        d = math.hypot(dx, dy)
+        if d <= radius * 2:
+            continue
+        ux, uy = dx / d, dy / d
+        x1, y1 = a.x + ux * radius, a.y + uy * radius
+        x2, y2 = b.x - ux * radius, b.y - uy * radius
+        result.append((x1, y1, x2, y2))
+        for side in (1, -1):
+            hx = x2 - (ux + side * uy * 0.5) * head
+            hy = y2 - (uy - side * ux * 0.5) * head
+            result.append((x2, y2, hx, hy))
+    return result
@@ -0,0 +1,177 @@
+import math
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+# Matrices are (a, b, c, d, e, f) mapping (x, y) to
+# (a * x + b * y + c, d * x + e * y + f).
+
+# Matrix Functions
+def identity():
+    return (1, 0, 0, 0, 1, 0)
+
+def multiply(m, n):
+    a, b, c, d, e, f = m
+    g, h, i, j, k, l = n
+    return (
+        a * g + b * j, a * h + b * k, a * i + b * l + c,
+        d * g + e * j, d * h + e * k, d * i + e * l + f,
+    )
+
+def translation(dx, dy):
+    return (1, 0, dx, 0, 1, dy)
+
+def scaling(sx, sy=None, cx=0, cy=0):
+    if sy is None:
+        sy = sx
+    return (sx, 0, cx - sx * cx, 0, sy, cy - sy * cy)
+
+def rotation(degrees, cx=0, cy=0):
+    angle = math.radians(degrees)
+    c, s = math.cos(angle), math.sin(angle)
+    return (c, -s, cx - c * cx + s * cy, s, c, cy - s * cx - c * cy)
+
+def reflection(degrees, cx=0, cy=0):
+    angle = math.radians(degrees) * 2
+    c, s = math.cos(angle), math.sin(angle)
+    return (c, s, cx - c * cx - s * cy, s, -c, cy - s * cx + c * cy)
+
+# Coordinate Functions
+def affine(xs, ys, matrix):
+    a, b, c, d, e, f = matrix
+    if numpy is not None:
+        xs = numpy.asarray(xs, dtype=float)
+        ys = numpy.asarray(ys, dtype=float)
+        return a * xs + b * ys + c, d * xs + e * ys + f
+    rx = [a * x + b * y + c for x, y in zip(xs, ys)]
+    ry = [d * x + e * y + f for x, y in zip(xs, ys)]
+    return rx, ry
+
+def radial(xs, ys, dr, cx=0, cy=0):
+    if numpy is not None:
+        dx = numpy.asarray(xs, dtype=float) - cx
+        dy = numpy.asarray(ys, dtype=float) - cy
+        radius = numpy.hypot(dx, dy)
+        nonzero = radius > 0
+        k = numpy.ones_like(radius)
+        k[nonzero] = (radius[nonzero] + dr) / radius[nonzero]
+        return cx + dx * k, cy + dy * k
+    rx, ry = [], []
+    for x, y in zip(xs, ys):
+        dx, dy = x - cx, y - cy
+        radius = (dx * dx + dy * dy) ** 0.5
+        if radius:
+            k = (radius + dr) / radius
+            x, y = cx + dx * k, cy + dy * k
+        rx.append(x)
+        ry.append(y)
+    return rx, ry
+
+def to_list(values):
+    if numpy is not None and isinstance(values, numpy.ndarray):
+        integral = numpy.isfinite(values) & (values == numpy.floor(values))
+        result = values.astype(object)
+        result[integral] = values[integral].astype(int).astype(object)
+        return result.tolist()
+    return [int(value) if value == int(value) else value for value in values]
+
+# Entity Functions
+def gather(entities):
+    targets = []
+    for entity in entities:
+        targets.append(entity)
+        if entity.path:
+            targets.append(entity.path)
+    xs = [target.x for target in targets]
+    ys = [target.y for target in targets]
+    return targets, xs, ys
+
+def expand(entities, values):
+    result = []
+    for entity, value in zip(entities, values):
+        result.append(value)
+        if entity.path:
+            result.append(value)
+    return result
+
+def scatter(targets, xs, ys):
+    # writes straight into each instance dict, so a Hashed target drops its
+    # cached hash once instead of going through __setattr__ per coordinate
+    for target, x, y in zip(targets, to_list(xs), to_list(ys)):
+        state = target.__dict__
+        state['x'] = x
+        state['y'] = y
+        state.pop('_hash', None)
+
+def transform(entities, matrix):
+    targets, xs, ys = gather(entities)
+    xs, ys = affine(xs, ys, matrix)
+    scatter(targets, xs, ys)
+
+def offset(entities, dr, cx=0, cy=0):
+    targets, xs, ys = gather(entities)
+    xs, ys = radial(xs, ys, dr, cx, cy)
+    scatter(targets, xs, ys)
+
+def linear_array(entities, count):
+    copies, dxs, dys = [], [], []
+    if count < 2:
+        return copies
+    for entity in entities:
+        x, y = entity.x, entity.y
+        if x == 0 and y == 0:
+            continue
+        for i in range(1, count):
+            k = float(i) / (count - 1)
+            copies.append(entity.copy())
+            dxs.append(-x * k)
+            dys.append(-y * k)
+    targets, xs, ys = gather(copies)
+    dxs = expand(copies, dxs)
+    dys = expand(copies, dys)
+    if numpy is not None:
+        xs = numpy.add(xs, dxs)
+        ys = numpy.add(ys, dys)
+    else:
+        xs = [x + dx for x, dx in zip(xs, dxs)]
+        ys = [y + dy for y, dy in zip(ys, dys)]
+    scatter(targets, xs, ys)
+    return copies
+
+def circular_array(entities, count, cx=0, cy=0):
+    copies, steps = [], []
+    if count < 2:
+        return copies
+    for entity in entities:
+        for i in range(1, count):
+            copies.append(entity.copy())
+            steps.append(i)
+    targets, xs, ys = gather(copies)
+    steps = expand(copies, steps)
+    step = 2 * math.pi / count
+    if numpy is not None:
+        angles = numpy.asarray(steps, dtype=float) * step
+        c, s = numpy.cos(angles), numpy.sin(angles)
+        dx = numpy.asarray(xs, dtype=float) - cx
+        dy = numpy.asarray(ys, dtype=float) - cy
+        xs, ys = cx + c * dx - s * dy, cy + s * dx + c * dy
+    else:
+        table = [(math.cos(step * i), math.sin(step * i)) for i in range(count)]
+        rx, ry = [], []
+        for x, y, i in zip(xs, ys, steps):
+            c, s = table[i]
+            dx, dy = x - cx, y - cy
+            rx.append(cx + c * dx - s * dy)
+            ry.append(cy + s * dx + c * dy)
+        xs, ys = rx, ry
+    scatter(targets, xs, ys)
+    return copies
+
+def center(entities):
+    xs = [entity.x for entity in entities]
+    ys = [entity.y for entity in entities]
+    if not xs:
+        return (0, 0)
+    return ((min(xs) + max(xs)) / 2.0, (min(ys) + max(ys)) / 2.0)
@@ -0,0 +1,102 @@
+import spatial
+import teleports
+
+class Item(object):
+    def __init__(self, name, x, y, radius, solid=False, inside=True, number=None, target=None):
+        self.name = name
+        self.x = x
+        self.y = y
+        self.radius = radius
+        self.solid = solid
+        self.inside = inside
+        self.number = number
+        self.target = target
+    @property
+    def label(self):
+        return '%s (%g, %g)' % (self.name, self.x, self.y)
+    @property
+    def state(self):
+        return (self.name, self.x, self.y, self.radius, self.solid, self.inside, self.number, self.target)
+
+class Problem(object):
+    def __init__(self, message, keys):
+        self.message = message
+        self.keys = tuple(keys)
+
+class Validator(object):
+    def __init__(self, size=64):
+        self.size = size
+        self.network = teleports.Network()
+        self.reset()
+    def reset(self):
+        self.items = {}
+        self.grid = spatial.Grid(self.size)
+        self.pairs = {}
+    def update(self, items):
+        self.network.update(dict((key, item) for key, item in items.items() if item.number is not None))
+        old = self.items
+        changed = [key for key, item in items.items() if key not in old or old[key].state != item.state]
+        removed = [key for key in old if key not in items]
+        if len(changed) + len(removed) > len(items) / 2:
+            self.rebuild(items)
+            return
+        for key in removed:
+            self.discard(key)
+        for key in changed:
+            self.discard(key)
+        for key in changed:
+            self.add(key, items[key])
+    def rebuild(self, items):
+        self.reset()
+        keys = list(items)
+        circles = [(items[key].x, items[key].y, items[key].radius) for key in keys]
+        for i, j in spatial.sweep(circles):
+            a, b = keys[i], keys[j]
+            if items[a].solid or items[b].solid:
+                self.link(a, b)
+        for key in keys:
+            item = items[key]
+            self.grid.insert(key, item.x, item.y, item.radius)
+        self.items = dict(items)
+    def add(self, key, item):
+        for other in self.grid.query(item.x, item.y, item.radius):
+            if item.solid or self.items[other].solid:
+                self.link(key, other)
+        self.grid.insert(key, item.x, item.y, item.radius)
+        self.items[key] = item
+    def discard(self, key):
+        if key not in self.items:
+            return
+        self.grid.remove(key)
+        for other in self.pairs.pop(key, ()):
+            self.pairs[other].discard(key)
+        del self.items[key]
+    def link(self, a, b):
+        self.pairs.setdefault(a, set()).add(b)
+        self.pairs.setdefault(b, set()).add(a)
+    def problems(self):
+        items = self.items
+        result = []
+        seen = set()
+        for key, others in self.pairs.items():
+            for other in others:
+                pair = frozenset((key, other))
+                if pair in seen:
+                    continue
+                seen.add(pair)
+                a, b = sorted((key, other), key=lambda k: (not items[k].solid, items[k].label))
+                message = '%s overlaps %s' % (items[a].label, items[b].label)
+                result.append(Problem(message, (a, b)))
+        for key, item in items.items():
+            if not item.inside:
+                message = '%s is outside bounds' % item.label
+                result.append(Problem(message, (key,)))
+        for message, keys in self.network.problems():
+            result.append(Problem(message, keys))
+        result.sort(key=lambda problem: problem.message)
+        return result
+
+def validate(items):
+    validator = Validator()
+    validator.update(dict(enumerate(items)))
+    return validator.problems()